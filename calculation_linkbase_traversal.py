@@ -15,12 +15,27 @@ __copyright__ = "Copyright 2015, 2016 Altova GmbH"
 __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 
 # This script uses RaptorXML Python API v2 to print out all the calculation networks found in the DTS as simple trees
+# With the check script parameter set to true, the summations in each calculation network are additionally checked against the instance facts
+# and inconsistencies are printed together with their rounding tolerance.
+# Only reported contributing facts are summed, unreported contributing concepts are skipped as in XBRL 2.1.
+# Facts are matched by context id and unit id, so s-equal contexts or units with different ids are not checked against each other.
 #
 # Example invocation:
 # raptorxmlxbrl valxbrl --script=calculation_linkbase_traversal.py
 # nanonull.xbrl
+# raptorxmlxbrl valxbrl --script=calculation_linkbase_traversal.py
+# --script-param="check:true" nanonull.xbrl
+#
+# Specify the output script parameter to write the trees to a file in the output directory instead of the console, e.g.
+# raptorxmlxbrl valxbrl --script=calculation_linkbase_traversal.py
+# --script-param="output:calculation.txt" nanonull.xbrl
 
 from altova import *
+import builtins
+import decimal
+import math
+import os
+import sys
 
 
 def concept_label(concept, label_role=None):
@@ -35,17 +50,33 @@ def concept_label(concept, label_role=None):
     return labels[0].text
 
 
-def print_tree_level(network, concept, weight=None, level=1):
-    # Print label of concept
-    if weight:
-        print('\t' * level, weight, '*', concept_label(concept))
-    else:
-        print('\t' * level, concept_label(concept))
+def print_tree(network, root, lines):
+    # Traverse the tree with an explicit stack instead of recursion, so deep
+    # networks cannot exceed Python's recursion limit. Each stack entry holds
+    # the concept, the weight of the relationship leading to it and its level.
+    stack = [(root, None, 1)]
+    # Concepts on the path from the root to the current concept
+    path = []
+    while stack:
+        concept, weight, level = stack.pop()
+        del path[level - 1:]
 
-    # Iterate over all child concepts
-    for rel in network.relationships_from(concept):
-        # Recurse for each child concept
-        print_tree_level(network, rel.target, rel.weight, level + 1)
+        # Print label of concept
+        if weight:
+            lines.append('%s %s * %s\n' % ('\t' * level, weight, concept_label(concept)))
+        else:
+            lines.append('%s %s\n' % ('\t' * level, concept_label(concept)))
+
+        # Do not descend again into a concept which is already on the path
+        if concept.qname in path:
+            lines.append('%s (cycle)\n' % ('\t' * (level + 1)))
+            continue
+        path.append(concept.qname)
+
+        # Push all child concepts in reverse order, so they are printed in
+        # relationship order
+        children = [(rel.target, rel.weight, level + 1) for rel in network.relationships_from(concept)]
+        stack.extend(reversed(children))
 
 
 def linkrole_definition(dts, linkrole):
@@ -58,8 +89,10 @@ def linkrole_definition(dts, linkrole):
         return linkrole
 
 
-def print_calculation_tree(dts, linkrole):
-    print(linkrole_definition(dts, linkrole))
+def print_calculation_tree(dts, linkrole, out=None):
+    # Collect the lines of the whole tree and write them at once instead of
+    # one console write per node
+    lines = [linkrole_definition(dts, linkrole), '\n']
 
     # Get the effective network of calculation relationships for the given
     # linkrole URI
@@ -67,13 +100,126 @@ def print_calculation_tree(dts, linkrole):
 
     # Iterate over all root concepts
     for root in network.roots:
-        print_tree_level(network, root)
+        print_tree(network, root, lines)
 
+    (out if out else sys.stdout).write(''.join(lines))
 
-def print_calculation_linkbase(dts):
+
+def print_calculation_linkbase(dts, out=None):
     # Iterate over all calculation extended link roles
     for linkrole in dts.calculation_link_roles():
-        print_calculation_tree(dts, linkrole)
+        print_calculation_tree(dts, linkrole, out)
+
+
+def write_calculation_linkbase(job, dts):
+    # Write the trees to the file given by the output script parameter or
+    # print them to the console
+    if 'output' in job.script_params:
+        filepath = os.path.join(job.output_dir, job.script_params['output'])
+        with builtins.open(filepath, mode='w', encoding='utf-8', buffering=1 << 16) as f:
+            print_calculation_linkbase(dts, f)
+        # Register new output file with RaptorXML engine
+        job.append_output_filename(filepath)
+    else:
+        print_calculation_linkbase(dts)
+
+
+def fact_tolerance(fact, value):
+    # Half a unit in the last significant digit given by the decimals or
+    # precision attribute
+    attr = fact.element.find_attribute('decimals')
+    if attr:
+        decimals = attr.normalized_value.strip()
+    else:
+        attr = fact.element.find_attribute('precision')
+        if not attr or attr.normalized_value.strip() == 'INF':
+            return decimal.Decimal(0)
+        precision = int(attr.normalized_value)
+        if value == 0:
+            return decimal.Decimal(0)
+        decimals = precision - int(math.floor(math.log10(abs(value)))) - 1
+    if decimals == 'INF':
+        return decimal.Decimal(0)
+    return decimal.Decimal('0.5').scaleb(-int(decimals))
+
+
+def index_facts(instance):
+    # Group the numeric facts by context and unit, so that all facts taking
+    # part in one summation are found with a single lookup
+    groups = {}
+    for fact in instance.facts:
+        if isinstance(fact, xbrl.Tuple) or fact.xsi_nil or not fact.concept.is_numeric():
+            continue
+        concepts = groups.setdefault((fact.context.id, fact.unit.id), {})
+        # Only the first of several duplicate facts is considered
+        concepts.setdefault(str(fact.concept.qname), fact)
+    return groups
+
+
+def summation_children(network):
+    # Map each summation concept to its contributing concepts and weights,
+    # traversing the network once starting from the roots
+    children = {}
+    stack = list(network.roots)
+    while stack:
+        concept = stack.pop()
+        key = str(concept.qname)
+        if key in children:
+            continue
+        children[key] = [(str(rel.target.qname), decimal.Decimal(str(rel.weight)).normalize()) for rel in network.relationships_from(concept)]
+        stack.extend(rel.target for rel in network.relationships_from(concept))
+    return {key: contributions for key, contributions in children.items() if contributions}
+
+
+def weighted_sum(concept, facts, children):
+    # Return the weighted sum and rounding tolerance of the reported
+    # contributing facts within one context/unit group. As in XBRL 2.1,
+    # contributing concepts without a fact are ignored and not inferred from
+    # their own contributors.
+    total = decimal.Decimal(0)
+    tolerance = decimal.Decimal(0)
+    contributing = False
+    for child, weight in children[concept]:
+        fact = facts.get(child)
+        if fact is not None:
+            contributing = True
+            value = fact.effective_numeric_value
+            total += weight * value
+            tolerance += abs(weight) * fact_tolerance(fact, value)
+    return (total, tolerance) if contributing else None
+
+
+def check_calculation_tree(dts, linkrole, groups):
+    network = dts.calculation_base_set(linkrole).network_of_relationships()
+    children = summation_children(network)
+    inconsistencies = 0
+    for (context, unit), facts in groups.items():
+        for concept in children:
+            fact = facts.get(concept)
+            if fact is None:
+                continue
+            computed = weighted_sum(concept, facts, children)
+            if computed is None:
+                continue
+            value = fact.effective_numeric_value
+            tolerance = fact_tolerance(fact, value) + computed[1]
+            if abs(value - computed[0]) > tolerance:
+                inconsistencies += 1
+                print('Inconsistent %s in context %s and unit %s: reported %s, computed %s, difference %s exceeds rounding tolerance %s' % (
+                    concept_label(fact.concept), context, unit, value, computed[0], abs(value - computed[0]), tolerance))
+    return inconsistencies
+
+
+def check_calculation_linkbase(instance):
+    groups = index_facts(instance)
+    inconsistencies = 0
+    # Iterate over all calculation extended link roles
+    for linkrole in instance.dts.calculation_link_roles():
+        count = check_calculation_tree(instance.dts, linkrole, groups)
+        if count:
+            print('%d calculation inconsistencies in %s' % (count, linkrole_definition(instance.dts, linkrole)))
+        inconsistencies += count
+    print('Found %d calculation inconsistencies' % inconsistencies)
 
 # Main entry point, will be called by RaptorXML after the XBRL taxonomy
 # (DTS) validation job has finished
@@ -82,7 +228,7 @@ def print_calculation_linkbase(dts):
 def on_dts_finished(job, dts):
     # dts object will be None if validation was not successful
     if dts:
-        print_calculation_linkbase(dts)
+        write_calculation_linkbase(job, dts)
 
 # Main entry point, will be called by RaptorXML after the XBRL instance
 # validation job has finished
@@ -91,4 +237,6 @@ def on_dts_finished(job, dts):
 def on_xbrl_finished(job, instance):
     # instance object will be None if validation was not successful
     if instance:
-        print_calculation_linkbase(instance.dts)
+        write_calculation_linkbase(job, instance.dts)
+        if job.script_params.get('check', 'false') == 'true':
+            check_calculation_linkbase(instance)
@@ -15,6 +15,7 @@ __copyright__ = "Copyright 2015, 2016 Altova GmbH"
 __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 
 # This script uses Altova RaptorXML+XBRL Python API v2 to demonstrate how to add additional validation rules and report custom errors.
+# Rules are registered with the @rule decorator, which declares the facts a rule applies to, and are all evaluated in a single pass over the facts.
 #
 # Example invocations:
 #
@@ -22,6 +23,17 @@ __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 #   raptorxmlxbrl valxbrl --script=custom_validation.py instance.xbrl
 # Validate a single filing with additional options
 #   raptorxmlxbrl valxbrl --script=custom_validation.py --script-param=myvalue:456 instance.xbrl
+# Evaluate the rules over partitions of the facts on 4 worker threads
+#   raptorxmlxbrl valxbrl --script=custom_validation.py --script-param=workers:4 instance.xbrl
+# Additionally evaluate the XPath assertion rules in rules.json
+#   raptorxmlxbrl valxbrl --script=custom_validation.py --script-param=xpath-rules:rules.json instance.xbrl
+# Re-validate an amended filing, only evaluating the rules for new or changed facts since the previous run
+#   raptorxmlxbrl valxbrl --script=custom_validation.py --script-param=state:/path/to/outcomes.json amended.xbrl
+# Report at most 10 errors per rule and write all occurrences to a JSONL file
+#   raptorxmlxbrl valxbrl --script=custom_validation.py --script-param=max-errors-per-rule:10 --script-param=errors-jsonl:errors.jsonl instance.xbrl
+#
+# Validate many stored filings in one process, loading the DTS of each taxonomy only once
+#   raptorxmlxbrl script custom_validation.py /path/to/filings --result results.json --workers 8
 #
 # Using Altova RaptorXML+XBRL Server with XMLSpy client:
 #
@@ -37,36 +49,399 @@ __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 
 
 from altova import *
+from altova_api.v2 import xpath
+import argparse
+import builtins
+import concurrent.futures
 import decimal
+import hashlib
+import json
+import marshal
+import math
+import multiprocessing
+import os
+import pathlib
+import re
+import threading
+import time
+import urllib.parse
+
+
+# Rule registry
+#
+# Each rule is a generator function that receives a single fact and the
+# script parameters and yields an error for every problem it finds. The
+# keyword arguments of the @rule decorator declare which facts the rule
+# applies to, so the engine below can evaluate all rules in a single pass
+# over the instance and send each fact only to the rules that apply to it.
+
+class Rule:
+    """A custom validation rule and the facts it applies to."""
+
+    def __init__(self, check, name=None, numeric=None, namespaces=None, types=None, tuples=False, fingerprint=None):
+        self.check = check
+        self.name = name if name else check.__name__
+        # Identifies the rule implementation for incremental re-validation;
+        # defaults to a hash of the compiled check function
+        self.fingerprint = fingerprint if fingerprint else hashlib.sha256(marshal.dumps(check.__code__)).hexdigest()
+        # True/False to restrict the rule to numeric/non-numeric concepts
+        self.numeric = numeric
+        # Concept namespaces the rule applies to
+        self.namespaces = frozenset(namespaces) if namespaces else None
+        # Concept data types in {namespace}local-name notation; types derived
+        # from one of these types also match
+        self.types = frozenset(types) if types else None
+        # Tuple facts are only passed to rules which explicitly ask for them
+        self.tuples = tuples
+
+    def applies_to(self, concept):
+        if isinstance(concept, xbrl.taxonomy.Tuple):
+            return self.tuples
+        if self.numeric is not None and concept.is_numeric() != self.numeric:
+            return False
+        if self.namespaces is not None and concept.qname.namespace_name not in self.namespaces:
+            return False
+        if self.types is not None and self.types.isdisjoint(type_hierarchy(concept.type_definition)):
+            return False
+        return True
+
+
+rules = []
+
+
+def rule(**kwargs):
+    # Decorator which registers the decorated generator function as a rule
+    def register(check):
+        rules.append(Rule(check, **kwargs))
+        return check
+    return register
+
+
+def type_hierarchy(type_definition):
+    # Yield the names of the given type and all its base types in
+    # {namespace}local-name notation
+    while type_definition is not None:
+        yield '{%s}%s' % (type_definition.target_namespace, type_definition.name)
+        base = type_definition.base_type_definition
+        if base is type_definition:
+            # xs:anyType is its own base type
+            break
+        type_definition = base
+
+
+class ErrorReporter:
+    """Reports at most max_errors errors per rule to the error log and summarizes the remaining occurrences."""
+
+    def __init__(self, error_log, max_errors=None, jsonl_file=None):
+        self.error_log = error_log
+        self.max_errors = max_errors
+        self.jsonl_file = jsonl_file
+        self.counts = {}
+
+    def report(self, rule, fact, error):
+        count = self.counts.get(rule.name, 0) + 1
+        self.counts[rule.name] = count
+        if self.max_errors is None or count <= self.max_errors:
+            self.error_log.report(error)
+        if self.jsonl_file:
+            # Stream every occurrence to the JSONL file, one JSON object per line
+            self.jsonl_file.write(json.dumps(fact_occurrence(rule, fact)) + '\n')
+
+    def keeps(self, count):
+        # Whether the count-th occurrence of a rule within a partition must be
+        # kept for reporting
+        return self.jsonl_file is not None or self.max_errors is None or count <= self.max_errors
+
+    def add_count(self, rule_name, count):
+        # Account for occurrences which were dropped before reporting
+        self.counts[rule_name] = self.counts.get(rule_name, 0) + count
+
+    def finish(self):
+        # Report a single summary error for each rule that exceeded the limit
+        if self.max_errors is None:
+            return
+        for name, count in self.counts.items():
+            if count > self.max_errors:
+                self.error_log.report(xbrl.Error.create('Rule {rule} failed for {count} more facts.', rule=xml.Error.Param(name, quotes=False), count=xml.Error.Param(
+                    str(count - self.max_errors), tooltip='Use the errors-jsonl option to write all occurrences to a file!', quotes=False)))
+
+
+def fact_occurrence(rule, fact):
+    occurrence = {'rule': rule.name, 'concept': str(fact.concept.qname)}
+    if not isinstance(fact, xbrl.Tuple):
+        occurrence['context'] = fact.context.id
+        if fact.unit:
+            occurrence['unit'] = fact.unit.id
+        occurrence['value'] = None if fact.xsi_nil else fact.normalized_value
+    return occurrence
 
 
-def check_custom_rules(instance, error_log, myvalue):
-    # For demonstration purposes, let's say that only the numeric value
-    # myvalue is ever allowed in XBRL facts!
+def iterate_errors(facts, params, rules, cache=None):
+    # The applicable rules only depend on the concept, so they are determined
+    # once per concept
+    dispatch = {}
 
-    # Iterate over every fact in the instance
-    for fact in instance.facts:
-        # Ignore tuples
+    for fact in facts:
+        concept = fact.concept
+        key = str(concept.qname)
+        applicable = dispatch.get(key)
+        if applicable is None:
+            applicable = dispatch[key] = [r for r in rules if r.applies_to(concept)]
+        if cache is None:
+            for r in applicable:
+                for error in r.check(fact, params):
+                    yield r, fact, error
+        else:
+            fact_hash = cache.fact_hash(fact)
+            failing = set()
+            for r in cache.rules_to_evaluate(fact_hash, applicable):
+                for error in r.check(fact, params):
+                    failing.add(r.name)
+                    yield r, fact, error
+            cache.record(fact_hash, failing)
+
+
+def evaluate_partition(facts, params, rules, reporter, cache=None):
+    # Collect the errors of one partition, dropping the occurrences which
+    # would exceed the error limit anyway
+    occurrences = []
+    counts = {}
+    dropped = {}
+    for r, fact, error in iterate_errors(facts, params, rules, cache):
+        count = counts[r.name] = counts.get(r.name, 0) + 1
+        if reporter.keeps(count):
+            occurrences.append((r, fact, error))
+        else:
+            dropped[r.name] = dropped.get(r.name, 0) + 1
+    return occurrences, dropped
+
+
+# Incremental re-validation
+#
+# Amended filings usually only change a small fraction of the facts. The
+# OutcomeCache persists, for every fact, the names of the rules it failed,
+# keyed by a hash of the fact's aspects and value. On re-validation, rules are
+# skipped for facts which are unchanged and previously passed them, provided
+# the rule itself and the script parameters are unchanged as well. Rules that
+# failed before are evaluated again, so their errors are still reported.
+
+def element_string(elem):
+    # Canonical string of an element's name and text content, used for typed
+    # dimension values
+    text = [elem.local_name, '(']
+    for child in elem.children:
+        if isinstance(child, xml.ElementInformationItem):
+            text.append(element_string(child))
+        elif isinstance(child, xml.CharDataInformationItem):
+            if not child.element_content_whitespace:
+                text.append(child.value)
+    text.append(')')
+    return ''.join(text)
+
+
+class OutcomeCache:
+    """Persists the failing rules of every fact between validation runs."""
+
+    def __init__(self, path, rules, params):
+        self.path = path
+        params_key = repr(sorted((key, str(value)) for key, value in params.items()))
+        self.rule_keys = {r.name: hashlib.sha256((r.fingerprint + params_key).encode('utf-8')).hexdigest() for r in rules}
+        try:
+            with builtins.open(path, mode='r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {'rules': {}, 'facts': {}}
+        # Previous outcomes can only be reused for unchanged rules
+        self.unchanged_rules = set(name for name, key in self.rule_keys.items() if state['rules'].get(name) == key)
+        self.previous = state['facts']
+        self.outcomes = {}
+        self.contexts = {}
+        # Partitions evaluated in parallel may record duplicate facts
+        self.lock = threading.Lock()
+
+    def context_key(self, context):
+        key = self.contexts.get(context.id)
+        if key is None:
+            entity = context.entity_identifier_aspect_value
+            period = context.period_aspect_value
+            if period.period_type == xbrl.PeriodType.INSTANT:
+                period = period.instant.isoformat()
+            elif period.period_type == xbrl.PeriodType.START_END:
+                period = '%s/%s' % (period.start.isoformat(), period.end.isoformat())
+            else:
+                period = 'forever'
+            dimensions = []
+            for aspect in context.dimension_aspect_values:
+                if isinstance(aspect, xbrl.ExplicitDimensionAspectValue):
+                    value = str(aspect.value.qname) if aspect.value else ''
+                else:
+                    value = element_string(aspect.value) if aspect.value else ''
+                dimensions.append('%s=%s' % (aspect.dimension.qname, value))
+            key = self.contexts[context.id] = '%s|%s|%s|%s' % (entity.scheme, entity.identifier, period, ','.join(sorted(dimensions)))
+        return key
+
+    def fact_hash(self, fact):
+        # Tuples are always evaluated
         if isinstance(fact, xbrl.Tuple):
-            continue
-
-        if fact.concept.is_numeric():
-            # Check the effective numeric value (which takes also the precision
-            # and decimals attributes into account)
-            if fact.effective_numeric_value != myvalue:
-                # Raise error that the value is incorrect
-                # location can be used to specify the default location for the
-                # whole error line. XMLSpy automatically jumps to the location
-                # of the first error after validation.
-                error_log.report(xbrl.Error.create('Value {fact:value} of fact {fact} must be equal to {myvalue}.', location='fact:value', fact=fact, myvalue=xml.Error.Param(
-                    str(myvalue), tooltip='Use the myvalue option to specify a different value!', quotes=False)))
+            return None
+        concept = fact.concept
+        if fact.xsi_nil:
+            value = 'nil'
+        elif concept.is_numeric():
+            value = str(fact.effective_numeric_value)
         else:
-            # Raise error that the type is incorrect
-            # location can be used to specify the default location for the
-            # whole error line. XMLSpy automatically jumps to the location of
-            # the first error after validation.
-            error_log.report(xbrl.Error.create(
-                'Fact {fact} has non-numeric type {type}.', location='fact', fact=fact, type=fact.concept.type_definition))
+            value = fact.normalized_value
+        unit = fact.unit.id if fact.unit else ''
+        text = '%s|%s|%s|%s' % (concept.qname, self.context_key(fact.context), unit, value)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def rules_to_evaluate(self, fact_hash, applicable):
+        failing = self.previous.get(fact_hash) if fact_hash else None
+        if failing is None:
+            # New or changed fact
+            return applicable
+        return [r for r in applicable if r.name not in self.unchanged_rules or r.name in failing]
+
+    def record(self, fact_hash, failing):
+        if fact_hash:
+            with self.lock:
+                if fact_hash in self.outcomes:
+                    # Facts with identical aspects and value (duplicates)
+                    failing = failing | set(self.outcomes[fact_hash])
+                self.outcomes[fact_hash] = sorted(failing)
+
+    def save(self):
+        # Write to a temporary file first so an interrupted run does not
+        # corrupt the previous state
+        tmp_path = self.path + '.tmp'
+        with builtins.open(tmp_path, mode='w', encoding='utf-8') as f:
+            json.dump({'rules': self.rule_keys, 'facts': self.outcomes}, f)
+        os.replace(tmp_path, self.path)
+
+
+def evaluate_rules(instance, reporter, params, rules=rules, workers=1, cache=None):
+    if workers <= 1:
+        # Iterate over every fact in the instance exactly once
+        for r, fact, error in iterate_errors(instance.facts, params, rules, cache):
+            reporter.report(r, fact, error)
+    else:
+        # Split the facts into more partitions than workers to balance the
+        # load, and report the errors in partition order so the result does
+        # not depend on the order in which the partitions finish
+        facts = list(instance.facts)
+        size = max(1, math.ceil(len(facts) / (workers * 4)))
+        partitions = [facts[i:i + size] for i in range(0, len(facts), size)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for occurrences, dropped in executor.map(lambda partition: evaluate_partition(partition, params, rules, reporter, cache), partitions):
+                for r, fact, error in occurrences:
+                    reporter.report(r, fact, error)
+                for name, count in dropped.items():
+                    reporter.add_count(name, count)
+    reporter.finish()
+
+
+# For demonstration purposes, let's say that only the numeric value myvalue
+# is ever allowed in XBRL facts!
+
+@rule(numeric=True)
+def check_numeric_value(fact, params):
+    # Check the effective numeric value (which takes also the precision and
+    # decimals attributes into account)
+    myvalue = params['myvalue']
+    if fact.effective_numeric_value != myvalue:
+        # Raise error that the value is incorrect
+        # location can be used to specify the default location for the whole
+        # error line. XMLSpy automatically jumps to the location of the first
+        # error after validation.
+        yield xbrl.Error.create('Value {fact:value} of fact {fact} must be equal to {myvalue}.', location='fact:value', fact=fact, myvalue=xml.Error.Param(
+            str(myvalue), tooltip='Use the myvalue option to specify a different value!', quotes=False))
+
+
+@rule(numeric=False)
+def check_numeric_type(fact, params):
+    # Raise error that the type is incorrect
+    # location can be used to specify the default location for the whole
+    # error line. XMLSpy automatically jumps to the location of the first
+    # error after validation.
+    yield xbrl.Error.create(
+        'Fact {fact} has non-numeric type {type}.', location='fact', fact=fact, type=fact.concept.type_definition)
+
+
+# XPath assertion rules
+#
+# Rules can also be written as XPath expressions in a JSON file, e.g.
+#
+#   [{"name": "positive-amounts", "test": "number(.) ge 0", "message": "Amounts must not be negative.",
+#     "numeric": true, "prefixes": {"xbrli": "http://www.xbrl.org/2003/instance"}}]
+#
+# The test expression is evaluated with the fact element as context item and
+# the fact passes if its effective boolean value is true. The optional
+# numeric, concept_namespaces and types members restrict the facts the rule
+# applies to, just like the arguments of the @rule decorator.
+#
+# Each expression is compiled only once per script process and the compiled
+# executable is cached by expression text, so it is reused for all facts and
+# all subsequent jobs.
+
+xpath_session = None
+xpath_executables = {}
+xpath_lock = threading.Lock()
+
+
+def compile_xpath(text, prefixes=None):
+    global xpath_session
+    key = (text, tuple(sorted(prefixes.items())) if prefixes else ())
+    with xpath_lock:
+        executable = xpath_executables.get(key)
+        if executable is None:
+            if xpath_session is None:
+                xpath_session = xpath.Session()
+            compile_options = xpath.CompileOptions(xpath_session)
+            if prefixes:
+                compile_options.statically_known_namespaces = prefixes
+            # Wrap the test to always get a single xs:boolean item
+            executable, log = xpath.Expression.compile('boolean((%s))' % text, compile_options)
+            if executable is None:
+                raise Exception('Failed to compile XPath expression "%s": %s' % (text, ', '.join(str(e) for e in log.errors)))
+            xpath_executables[key] = executable
+        return executable
+
+
+def xpath_rule(name, test, message=None, prefixes=None, numeric=None, concept_namespaces=None, types=None):
+    executable = compile_xpath(test, prefixes)
+    if not message:
+        message = 'The assertion %s is not satisfied.' % test
+
+    def check(fact, params):
+        runtime_options = xpath.RuntimeOptions(xpath_session)
+        runtime_options.initial_context = xpath.NodeItem.create_from_informationItem(fact.element, xpath_session)
+        result, log = executable.execute(runtime_options)
+        if result is None:
+            yield xbrl.Error.create('Evaluation of rule {rule} failed for fact {fact}: {details}', location='fact', fact=fact, rule=xml.Error.Param(name, quotes=False), details=xml.Error.Param(
+                ', '.join(str(e) for e in log.errors), quotes=False))
+        elif str(result[0]) != 'true':
+            yield xbrl.Error.create('Fact {fact} violates rule {rule}: {message}', location='fact', fact=fact, rule=xml.Error.Param(name, quotes=False), message=xml.Error.Param(
+                message, quotes=False))
+
+    fingerprint = json.dumps([test, message, prefixes], sort_keys=True)
+    return Rule(check, name, numeric=numeric, namespaces=concept_namespaces, types=types, fingerprint=fingerprint)
+
+
+def load_xpath_rules(path):
+    with builtins.open(path, mode='r', encoding='utf-8') as f:
+        return [xpath_rule(**definition) for definition in json.load(f)]
+
+
+def check_custom_rules(instance, error_log, myvalue, max_errors=None, jsonl_file=None, workers=1, extra_rules=(), state_file=None):
+    params = {'myvalue': myvalue}
+    all_rules = rules + list(extra_rules)
+    cache = OutcomeCache(state_file, all_rules, params) if state_file else None
+    reporter = ErrorReporter(error_log, max_errors, jsonl_file)
+    evaluate_rules(instance, reporter, params, all_rules, workers, cache)
+    if cache:
+        cache.save()
+    # Return the number of occurrences per rule
+    return reporter.counts
 
 # Main entry point, will be called by RaptorXML after the XBRL instance
 # validation job has finished
@@ -75,5 +450,153 @@ def check_custom_rules(instance, error_log, myvalue):
 def on_xbrl_finished(job, instance):
     # instance object will be None if XBRL 2.1 validation was not successful
     if instance:
-        check_custom_rules(instance, job.error_log, decimal.Decimal(
-            job.script_params.get('myvalue', '123')))
+        myvalue = decimal.Decimal(job.script_params.get('myvalue', '123'))
+        max_errors = int(job.script_params.get('max-errors-per-rule', '100'))
+        if max_errors <= 0:
+            max_errors = None
+        workers = int(job.script_params.get('workers', '1'))
+        extra_rules = load_xpath_rules(job.script_params['xpath-rules']) if 'xpath-rules' in job.script_params else []
+        state_file = job.script_params.get('state')
+        if 'errors-jsonl' in job.script_params:
+            filepath = os.path.join(job.output_dir, job.script_params['errors-jsonl'])
+            with builtins.open(filepath, mode='w', encoding='utf-8') as f:
+                check_custom_rules(instance, job.error_log, myvalue, max_errors, f, workers, extra_rules, state_file)
+            # Register new output file with RaptorXML engine
+            job.append_output_filename(filepath)
+        else:
+            check_custom_rules(instance, job.error_log, myvalue, max_errors, workers=workers, extra_rules=extra_rules, state_file=state_file)
+
+
+# Standalone batch mode
+
+class CollectingErrorLog:
+    """Collects the text of the reported errors in place of a job error log."""
+
+    def __init__(self):
+        self.messages = []
+
+    def report(self, error):
+        self.messages.append(str(error))
+
+
+def collect_input_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith('.xbrl'))
+        elif path.lower().endswith('.txt'):
+            # Relative paths in a manifest are resolved against the manifest location
+            base = os.path.dirname(os.path.abspath(path))
+            with builtins.open(path, mode='r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        files.append(line if '://' in line else os.path.join(base, line))
+        else:
+            files.append(path)
+    return files
+
+
+# The DTSes shared by all worker threads, keyed by the entry point or by the
+# taxonomy references of the instances, so that each taxonomy is loaded once
+shared_dts = {}
+shared_dts_lock = threading.Lock()
+
+taxonomy_ref_pattern = re.compile(rb'''<(?:[\w.-]+:)?(?:schemaRef|linkbaseRef)\b[^>]*?href\s*=\s*["']([^"']+)''')
+
+
+def taxonomy_key(file, size=1024*1024):
+    # Cheaply determines the sorted absolute schemaRef/linkbaseRef URLs of a
+    # local instance without loading it, or None if they cannot be determined
+    if not os.path.isfile(file):
+        return None
+    with builtins.open(file, mode='rb') as f:
+        head = f.read(size)
+    base = pathlib.Path(os.path.abspath(file)).as_uri()
+    refs = {urllib.parse.urljoin(base, href.decode('utf-8').strip()) for href in taxonomy_ref_pattern.findall(head)}
+    return tuple(sorted(refs)) if refs else None
+
+
+def load_shared_instance(file, entry_point=None):
+    # With an explicit entry point all instances share its DTS, otherwise only
+    # instances with the same set of taxonomy references share a DTS
+    key = entry_point or taxonomy_key(file)
+    if not key:
+        return xbrl.Instance.create_from_url(file)
+    with shared_dts_lock:
+        entry = shared_dts.setdefault(key, {'lock': threading.Lock(), 'dts': None})
+    # The first instance of a taxonomy loads the DTS, concurrent instances of
+    # the same taxonomy wait for it and then reuse it
+    with entry['lock']:
+        if entry['dts'] is None:
+            if not entry_point:
+                instance, log = xbrl.Instance.create_from_url(file)
+                if instance:
+                    entry['dts'] = instance.dts
+                return instance, log
+            dts, log = xbrl.taxonomy.DTS.create_from_url(entry_point)
+            if log.has_errors():
+                raise Exception(str(log))
+            entry['dts'] = dts
+    return xbrl.Instance.create_from_url(file, dts=entry['dts'])
+
+
+def validate_file(file, args, extra_rules):
+    result = {'file': file, 'errors': 0, 'rules': {}, 'messages': []}
+    start = time.perf_counter()
+    instance, log = load_shared_instance(file, args.entry_point)
+    if not instance or log.has_errors():
+        result['load_errors'] = [' '.join(str(log).split())]
+    else:
+        error_log = CollectingErrorLog()
+        result['rules'] = check_custom_rules(instance, error_log, args.myvalue, args.max_errors, extra_rules=extra_rules)
+        result['errors'] = sum(result['rules'].values())
+        result['messages'] = error_log.messages
+    result['time'] = time.perf_counter() - start
+    return result
+
+
+def validate_files(args):
+    files = collect_input_files(args.FILE)
+    extra_rules = load_xpath_rules(args.xpath_rules) if args.xpath_rules else []
+    print('Validating %d filings with %d workers...' % (len(files), args.workers))
+    start = time.perf_counter()
+
+    results = [None] * len(files)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(validate_file, file, args, extra_rules): i for i, file in enumerate(files)}
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = {'file': files[i], 'errors': 0, 'rules': {}, 'messages': [], 'load_errors': [str(e)]}
+            print('%s: %d errors' % (files[i], results[i]['errors']) if 'load_errors' not in results[i] else '%s: failed to load' % files[i])
+
+    # The combined result lists the instances in input order
+    summary = {
+        'instances': results,
+        'total_errors': sum(result['errors'] for result in results),
+        'failed': sum(1 for result in results if 'load_errors' in result),
+        'time': time.perf_counter() - start
+    }
+    with builtins.open(args.result, mode='w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print('Validated %d filings (%d failed to load) with %d errors in %.3fs' % (len(files), summary['failed'], summary['total_errors'], summary['time']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate many XBRL instances against the custom validation rules using Altova RaptorXML+XBRL')
+    parser.add_argument('FILE', nargs='+', help="directories containing *.xbrl instances, manifest files (*.txt) listing one instance per line, or instance files")
+    parser.add_argument('--result', required=True, help="the JSON file to which the combined results with the error counts per instance are written")
+    parser.add_argument('--entry-point', help="the taxonomy entry point shared by all instances; by default each worker only reuses a loaded DTS for instances with the same schemaRef and linkbaseRef URLs")
+    parser.add_argument('--myvalue', type=decimal.Decimal, default=decimal.Decimal('123'), help="the only numeric value allowed in facts")
+    parser.add_argument('--max-errors-per-rule', dest='max_errors', type=int, default=100, help="the maximum number of error messages kept per rule and instance")
+    parser.add_argument('--xpath-rules', help="a JSON file with additional XPath assertion rules")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help="the number of instances validated in parallel")
+    args = parser.parse_args()
+    if args.max_errors <= 0:
+        args.max_errors = None
+    validate_files(args)
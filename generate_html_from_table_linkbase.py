@@ -15,6 +15,8 @@ __copyright__ = "Copyright 2022 Altova GmbH"
 __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 
 # This script uses RaptorXML Python API v2 to generate HTML tables according to the layout specified in the XBRL Table linkbase.
+# A timings.json file with the time spent per definition table in layout generation, head and body rendering and file writing is written alongside the HTML output.
+# Unless single-output is specified, an index.html file links all generated HTML files.
 #
 # This script supports the following script parameters:
 #
@@ -22,6 +24,9 @@ __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 #   ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 #   single-output             boolean         Specify true to generate either one large HTML file containing all the tables or false to generate a separate HTML file per XBRL table resource.
 #   max-rows                  integer         Specify the maximum number of rows for a single HTML table. Tables that exceed the maximum number of rows are generated as multiple HTML tables with the same header.
+#   max-bytes                 integer         Specify the approximate maximum size in bytes of a single HTML file. Tables that exceed the size are split into multiple HTML files with the same header.
+#   sparse                    boolean         Specify true to omit table rows without any facts and merge runs of empty cells into a single HTML table cell. This only reduces the output size, the facts of all cells are still queried (use elimination to remove empty rows/columns in the layout model).
+#   slice-workers             integer         Specify the number of z-slices of a table that are rendered in parallel (default: 1).
 #   lang                      string          Specify the label language.
 #   label_role                string          Specify the label role (default: http://www.xbrl.org/2008/role/label).
 #   additional_label_role     string          Specify a role for additional labels.
@@ -33,7 +38,8 @@ __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 #   raptorxmlxbrl valxbrl --script=generate_html_from_table_linkbase.py --script-param="elimination:true" nanonull.xbrl
 
 
-import os, datetime, json
+import os, datetime, json, time, bisect
+import concurrent.futures, collections
 from altova import xml, xsd, xbrl
 
 X = xbrl.table.AxisType.X
@@ -91,6 +97,7 @@ def write_html(job, filename, body):
         f.writelines(html)
     # Register new output file with RaptorXML engine
     job.append_output_filename(path)
+    return os.path.getsize(path)
 
 def element_text(elem):
     text = []
@@ -312,54 +319,229 @@ def generate_table_head(html, dts, table, label_role=None, additional_label_role
         html.append('</tr>\n')
     html.append('</thead>\n')
 
-def generate_table_body(html, table, y_range, z, label_role=None, additional_label_role=None, lang=None):
+def generate_row_header(html, y_axis, header, rowspan, label_role=None, additional_label_role=None, lang=None, labels=None):
+    # labels optionally caches the rendered label of each header, so that headers repeated in several parts are only resolved once
+    if header.structural_node.is_rollup():
+        if not header.parent.structural_node.is_rollup() and not header_with_only_rollup_children(header.parent):
+            html.append('<th colspan="%d" rowspan="%d" class="rollup">\n' % (y_axis.row_count - header.row, rowspan))
+        else:
+            return
+    else:
+        colspan = y_axis.row_count - header.row if header_with_only_rollup_children(header) else 1
+        html.append('<th colspan="%d" rowspan="%d">\n' % (colspan, rowspan))
+        if labels is None:
+            generate_label(html, header, 'span', label_role, additional_label_role, lang)
+        else:
+            label = labels.get((header.row, header.slice))
+            if label is None:
+                label = labels[(header.row, header.slice)] = []
+                generate_label(label, header, 'span', label_role, additional_label_role, lang)
+            html.extend(label)
+    html.append('</th>\n')
+
+def generate_table_body(html, table, rows, label_role=None, additional_label_role=None, lang=None, labels=None):
+    # rows is a list of (y, data cells) tuples, the vertical header spans are clipped to the given rows
     y_axis = table.axis(Y)
+    kept = [y for y, row_html in rows]
 
     html.append('<tbody>\n')
+    emitted_headers = set()
     # For each slice on the y-axis
-    for y in y_range:
+    for y, row_html in rows:
         html.append('<tr>\n')
         # For each header row in the y-axis slice
         for header in y_axis.slice(y):
-            # Only generate <th> elements in rows where the header cell starts a vertical span
-            if header.slice == y:
-                if header.structural_node.is_rollup():
-                    if not header.parent.structural_node.is_rollup() and not header_with_only_rollup_children(header.parent):
-                        html.append('<th colspan="%d" rowspan="%d" class="rollup">\n' % (y_axis.row_count - header.row, header.span))
-                    else:
-                        continue
-                else:
-                    colspan = y_axis.row_count - header.row if header_with_only_rollup_children(header) else 1
-                    html.append('<th colspan="%d" rowspan="%d">\n' % (colspan, header.span))
-                    generate_label(html, header, 'span', label_role, additional_label_role, lang)
-                html.append('</th>\n')
-        # Data cells with fact values
-        for x in range(table.axis(X).slice_count):
-            html.append('<td>\n')
-            generate_cell_data(html, table.cell(x,y,z).facts, label_role, lang)
-            html.append('</td>\n')
+            # Only generate <th> elements in the first given row of the header's vertical span
+            if (header.row, header.slice) in emitted_headers:
+                continue
+            emitted_headers.add((header.row, header.slice))
+            # Only count the given rows within the header's vertical span
+            rowspan = bisect.bisect_left(kept, header.slice + header.span) - bisect.bisect_left(kept, header.slice)
+            generate_row_header(html, y_axis, header, rowspan, label_role, additional_label_role, lang, labels)
+        html.extend(row_html)
         html.append('</tr>\n')
     html.append('</tbody>\n')
-    
-def generate_table(job, instance, deftable, params):
+
+def generate_row_cells(table, y, z, label_role=None, lang=None):
+    html = []
+    # Data cells with fact values
+    for x in range(table.axis(X).slice_count):
+        html.append('<td>\n')
+        generate_cell_data(html, table.cell(x,y,z).facts, label_role, lang)
+        html.append('</td>\n')
+    return html
+
+def generate_sparse_row_cells(table, y, z, label_role=None, lang=None):
+    # Returns None for rows without any facts, which are dropped from the output
+    # The layout model offers no way to enumerate only the non-empty cells, so the facts of every cell of the row are queried
+    x_count = table.axis(X).slice_count
+    row_cells = [table.cell(x,y,z).facts for x in range(x_count)]
+    if not any(len(facts) for facts in row_cells):
+        return None
+
+    html = []
+    # Data cells with fact values, runs of empty cells are merged into a single cell
+    x = 0
+    while x < x_count:
+        if len(row_cells[x]):
+            html.append('<td>\n')
+            generate_cell_data(html, row_cells[x], label_role, lang)
+            html.append('</td>\n')
+            x += 1
+        else:
+            start = x
+            while x < x_count and not len(row_cells[x]):
+                x += 1
+            html.append('<td colspan="%d">&#xA0;</td>\n' % (x - start))
+    return html
+
+def html_size(html):
+    return sum(len(s.encode('utf-8')) for s in html)
+
+def render_slice(dts, table, z, max_rows, max_bytes, generate_row, label_role=None, additional_label_role=None, lang=None):
+    # Renders all parts of one z-slice into separate buffers, the slices of a table are independent of each other
+    # A new part is started whenever the next row would exceed max_rows rows or roughly max_bytes bytes of UTF-8 encoded HTML
+    # Headers spanning rows of several parts are repeated at the start of each part with their rowspan clipped to the part
+    y_axis = table.axis(Y)
+    x_count = table.axis(X).slice_count
+    slice_timings = {'head': 0.0, 'body': 0.0, 'cells': 0}
+
+    # The caption and head are the same for all parts of the slice
+    start = time.perf_counter()
+    head = []
+    generate_table_caption(head, table, z, label_role, additional_label_role, lang)
+    generate_table_head(head, dts, table, label_role, additional_label_role, lang)
+    head_size = html_size(head) + len('<table>\n<tbody>\n</tbody>\n</table>\n')
+    slice_timings['head'] += time.perf_counter() - start
+
+    def headers_size(y, emitted_headers):
+        # Size of the <th> elements the row adds to a part that already contains the given headers
+        html = []
+        for header in y_axis.slice(y):
+            if (header.row, header.slice) not in emitted_headers:
+                generate_row_header(html, y_axis, header, header.span, label_role, additional_label_role, lang, labels)
+        return html_size(html)
+
+    labels = {}
+    parts = []
+    part = None
+    start = time.perf_counter()
+    for y in range(y_axis.slice_count):
+        row_html = generate_row(table, y, z, label_role, lang)
+        # Counts the queried cells, which is the full grid in sparse mode too
+        slice_timings['cells'] += x_count
+        if row_html is None:
+            continue
+        size = html_size(row_html) + len('<tr>\n</tr>\n')
+        if part and len(part['rows']) >= max_rows:
+            parts.append(finish_part(head, part, table, label_role, additional_label_role, lang, labels))
+            part = None
+        if max_bytes:
+            headers = headers_size(y, part['headers'] if part else ())
+            if part and part['size'] + size + headers > max_bytes:
+                parts.append(finish_part(head, part, table, label_role, additional_label_role, lang, labels))
+                part = None
+                # All headers of the row are emitted at the start of the new part
+                headers = headers_size(y, ())
+            size += headers
+        if part is None:
+            part = {'rows': [], 'headers': set(), 'size': head_size}
+        if max_bytes:
+            part['headers'].update((header.row, header.slice) for header in y_axis.slice(y))
+        part['rows'].append((y, row_html))
+        part['size'] += size
+    if part:
+        parts.append(finish_part(head, part, table, label_role, additional_label_role, lang, labels))
+    slice_timings['body'] += time.perf_counter() - start
+    return parts, slice_timings
+
+def finish_part(head, part, table, label_role=None, additional_label_role=None, lang=None, labels=None):
+    html = ['<table>\n']
+    html.extend(head)
+    generate_table_body(html, table, part['rows'], label_role, additional_label_role, lang, labels)
+    html.append('</table>\n')
+    return html
+
+def map_bounded(executor, fn, items, window):
+    # Like executor.map, but only keeps about window tasks in flight, so that finished results do not pile up while the caller consumes them in order
+    futures = collections.deque()
+    for item in items:
+        futures.append(executor.submit(fn, item))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+def write_index(job, index):
+    # Write an index page with links to all generated files of all tables
+    body = ['<h1>Tables</h1>\n', '<ul>\n']
+    for table_id, label, files in index:
+        body.append('<li><span class="label">%s</span>\n' % xml_escape('%s (%s)' % (label, table_id) if label else table_id))
+        body.append('<ul>\n')
+        for filename, description in files:
+            body.append('<li><a href="%s">%s</a></li>\n' % (xml_escape(filename), xml_escape(description)))
+        body.append('</ul>\n</li>\n')
+    body.append('</ul>\n')
+    return write_html(job, 'index.html', body)
+
+def new_table_timings(deftable):
+    # Collects the time spent in each phase (in seconds) and the amount of generated output for one definition table
+    return {
+        'table': deftable.id,
+        'layout': 0.0,
+        'head': 0.0,
+        'body': 0.0,
+        'write': 0.0,
+        'cells': 0,
+        'bytes': 0,
+        'files': []
+    }
+
+def write_timed_html(job, filename, body, timings, description=None):
+    start = time.perf_counter()
+    timings['bytes'] += write_html(job, filename, body)
+    timings['write'] += time.perf_counter() - start
+    if description:
+        timings['files'].append((filename, description))
+
+def write_timings(job, timings, output_timings, runtime):
+    # Per-table figures plus the totals, which also include writing the combined output file in single-output mode
+    total = {key: sum(t[key] for t in timings) for key in ('layout', 'head', 'body', 'write', 'cells', 'bytes')}
+    total['write'] += output_timings['write']
+    total['bytes'] += output_timings['bytes']
+    summary = {
+        'runtime': runtime,
+        'total': total,
+        'tables': timings
+    }
+    path = os.path.join(job.output_dir, 'timings.json')
+    with open(path,'w',encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    # Register new output file with RaptorXML engine
+    job.append_output_filename(path)
+
+def generate_table(job, instance, deftable, params, timings):
     single_output_file = job.script_params.get('single-output','true') == 'true'
     lang = job.script_params.get('lang',None)
     label_role = job.script_params.get('label_role', 'http://www.xbrl.org/2008/role/label')
     additional_label_role = job.script_params.get('additional_label_role', None)
     max_rows = int(job.script_params.get('max-rows','10000'))
-
-    print(label_role)
+    max_bytes = int(job.script_params.get('max-bytes','0'))
+    generate_row = generate_sparse_row_cells if job.script_params.get('sparse','false') == 'true' else generate_row_cells
+    slice_workers = int(job.script_params.get('slice-workers','1'))
 
     body = []
     
     # Create layout model for the given definition table
     print('Calculating table layout for table "%s"...' % deftable.id)
+    start = time.perf_counter()
     (tableset, errorlog) = deftable.generate_layout_model(instance, **params)
+    timings['layout'] = time.perf_counter() - start
     if errorlog.has_errors():
         # Catch any errors during table resolution and layout process
         body.extend('<p class="error">%s</p>\n' % error.text.replace('\n','</br>') for error in errorlog.errors)
         if not single_output_file:
-            write_html(job,deftable.id+'.html', body)
+            write_timed_html(job,deftable.id+'.html', body, timings, 'Errors')
             body = []
     else:
         table_idx = 0
@@ -367,20 +549,22 @@ def generate_table(job, instance, deftable, params):
             print('Generating HTML for table "%s"...' % deftable.id)
             # Check for empty table after empty row/column elimination
             if not table.is_empty():
-                for z in range(table.axis(Z).slice_count):
-                    for y in range(0, table.axis(Y).slice_count, max_rows):
-                        body.append('<table>\n')    
-                        generate_table_caption(body, table, z, label_role, additional_label_role, lang)
-                        generate_table_head(body, instance.dts, table, label_role, additional_label_role, lang)
-                        generate_table_body(body, table, range(y,min(y+max_rows, table.axis(Y).slice_count)), z, label_role, additional_label_role, lang)
-                        body.append('</table>\n')
-                        if not single_output_file:
-                            write_html(job, '%s_%d_%d_%d.html' % (deftable.id, table_idx, z, y / max_rows), body)
-                            body = []
+                def render(z):
+                    return render_slice(instance.dts, table, z, max_rows, max_bytes, generate_row, label_role, additional_label_role, lang)
+                # Render the z-slices concurrently and assemble the output in z order, writing each slice before further slices are submitted
+                with concurrent.futures.ThreadPoolExecutor(max_workers=slice_workers) as executor:
+                    for z, (parts, slice_timings) in enumerate(map_bounded(executor, render, range(table.axis(Z).slice_count), slice_workers)):
+                        for key in ('head', 'body', 'cells'):
+                            timings[key] += slice_timings[key]
+                        for part, html in enumerate(parts):
+                            body.extend(html)
+                            if not single_output_file:
+                                write_timed_html(job, '%s_%d_%d_%d.html' % (deftable.id, table_idx, z, part), body, timings, 'Layout table %d, slice %d, part %d' % (table_idx+1, z+1, part+1))
+                                body = []
             else:
                 body.append('<p class="error">Table %s is empty (no data found)!</p>\n' % deftable.id)
                 if not single_output_file:
-                    write_html(job,deftable.id+'.html', body)
+                    write_timed_html(job,deftable.id+'.html', body, timings, 'Empty table')
                     body = []
             table_idx += 1
             
@@ -395,14 +579,28 @@ def generate_tables(job, instance):
     }
 
     # Generate HTML output file for each definition table in the table linkbase
+    start = time.perf_counter()
     body = []
+    timings = []
+    index = []
     for deftable in instance.dts.tables:
-        table = generate_table(job, instance, deftable, params)
+        table_timings = new_table_timings(deftable)
+        table = generate_table(job, instance, deftable, params, table_timings)
+        timings.append(table_timings)
         if single_output_file:
             body.extend(table)
+        else:
+            index.append((deftable.id, format_label(deftable, job.script_params.get('label_role', 'http://www.xbrl.org/2008/role/label'), job.script_params.get('additional_label_role', None), job.script_params.get('lang',None)), table_timings['files']))
 
+    output_timings = {'write': 0.0, 'bytes': 0}
     if single_output_file:
-        write_html(job,'tables.html', body)
+        write_timed_html(job,'tables.html', body, output_timings)
+    else:
+        start_index = time.perf_counter()
+        output_timings['bytes'] += write_index(job, index)
+        output_timings['write'] += time.perf_counter() - start_index
+
+    write_timings(job, timings, output_timings, time.perf_counter() - start)
 
 # Main entry point, will be called by RaptorXML after the XBRL instance validation job has finished
 def on_xbrl_finished(job, instance):
@@ -15,9 +15,13 @@ __copyright__ = "Copyright 2025 Altova GmbH"
 __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 
 # This script uses RaptorXML Python API v2 to generate HTML tables according to the layout specified in the XBRL Table linkbase.
+# A timings.json file with the time spent per definition table in layout generation, head and body rendering and file writing is written alongside the HTML output.
+# Unless --single-output is specified, an index.html file links all generated HTML files, including the files of tables generated by earlier runs into the same output directory (recorded in table_files.json).
+# Definition tables are processed largest-first according to a size estimate derived from their breakdown trees, which --max-cells uses to skip oversized tables.
 
 
-import os, datetime, json, argparse, pathlib
+import os, datetime, json, argparse, pathlib, csv, time, fnmatch, hashlib, re, zipfile, copy, threading, multiprocessing, bisect
+import concurrent.futures, collections, urllib.parse
 import altova_api.v2.xml as xml
 import altova_api.v2.xbrl as xbrl
 import altova_api.v2.xbrl.oim as oim
@@ -29,9 +33,9 @@ Z = xbrl.table.AxisType.Z
 
 unit_symbols = {
     xml.QName('USD','http://www.xbrl.org/2003/iso4217'): '$',
-    xml.QName('EUR','http://www.xbrl.org/2003/iso4217'): '&euro;',
-    xml.QName('GBP','http://www.xbrl.org/2003/iso4217'): '&pound;',
-    xml.QName('JPY','http://www.xbrl.org/2003/iso4217'): '&yen;'
+    xml.QName('EUR','http://www.xbrl.org/2003/iso4217'): '\u20ac',
+    xml.QName('GBP','http://www.xbrl.org/2003/iso4217'): '\u00a3',
+    xml.QName('JPY','http://www.xbrl.org/2003/iso4217'): '\u00a5'
 }
 
 def html_head():
@@ -76,6 +80,29 @@ def write_html(cmdlArgs, filename, body):
     path = os.path.join(cmdlArgs.OUTPUT_DIR, filename)
     with open(path,'w',encoding='utf-8') as f:
         f.writelines(html)
+    return os.path.getsize(path)
+
+def write_csv(cmdlArgs, filename, table, label_role=None, additional_label_role=None, lang=None):
+    x_axis = table.axis(X)
+    y_axis = table.axis(Y)
+    z_axis = table.axis(Z)
+
+    # Header label paths are resolved only once per slice
+    x_paths = [slice_label_path(x_axis, x, label_role, additional_label_role, lang) for x in range(x_axis.slice_count)]
+    y_paths = [slice_label_path(y_axis, y, label_role, additional_label_role, lang) for y in range(y_axis.slice_count)]
+
+    # Stream one CSV row per fact directly to the output file
+    path = os.path.join(cmdlArgs.OUTPUT_DIR, filename)
+    with open(path,'w',encoding='utf-8',newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('z', 'y', 'x', 'concept', 'value'))
+        for z in range(z_axis.slice_count):
+            z_path = slice_label_path(z_axis, z, label_role, additional_label_role, lang)
+            for y in range(y_axis.slice_count):
+                for x in range(x_axis.slice_count):
+                    for fact in table.cell(x,y,z).facts:
+                        writer.writerow((z_path, y_paths[y], x_paths[x], str(fact.concept.qname), fact_raw_value(fact)))
+    return os.path.getsize(path)
 
 def element_text(elem):
     text = []
@@ -88,7 +115,7 @@ def element_text(elem):
 def serialize_element(elem, include_self=True):
     text = []
     if include_self:
-        text.append('&lt;%s&gt;' % elem.local_name)
+        text.append('<%s>' % elem.local_name)
     for child in elem.children:
         if isinstance(child,xml.ElementInformationItem):
             text.append(serialize_element(child))
@@ -96,7 +123,7 @@ def serialize_element(elem, include_self=True):
             if not child.element_content_whitespace:
                 text.append(child.value)
     if include_self:
-        text.append('&lt;/%s&gt;' % elem.local_name)
+        text.append('</%s>' % elem.local_name)
     return ''.join(text)
 
 def get_labels(resource, label_role, additional_label_role, lang):
@@ -123,12 +150,12 @@ def concept_label(concept, preferred_label=None, lang=None):
     label = format_label(concept, preferred_label, None, lang)
     return label if label else str(concept.qname)
 
-def generate_label(html, header, html_element='span', label_role=None, additional_label_role=None, lang=None):
+def header_labels(header, label_role=None, additional_label_role=None, lang=None):
     label = format_label(header.structural_node.definition_node, label_role, additional_label_role, lang)
     if label:
-        html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=xml_escape(label)))
+        yield label
         return
-        
+
     tagged_cs = header.structural_node.constraint_sets
     if len(tagged_cs) == 1:
         cs = next(iter(tagged_cs.values()))
@@ -137,22 +164,22 @@ def generate_label(html, header, html_element='span', label_role=None, additiona
     if cs:
         for aspect in cs.values():
             if isinstance(aspect,xbrl.ConceptAspectValue):
-                html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=xml_escape(concept_label(aspect.concept, header.structural_node.preferred_label if header.structural_node.preferred_label else label_role, lang))))
+                yield concept_label(aspect.concept, header.structural_node.preferred_label if header.structural_node.preferred_label else label_role, lang)
 
             elif isinstance(aspect,xbrl.EntityIdentifierAspectValue):
-                html.append('<{element} class="label">{identifier} [{scheme}]</element>\n'.format(element=html_element, identifier=aspect.identifier, scheme=aspect.scheme))
+                yield '{identifier} [{scheme}]'.format(identifier=aspect.identifier, scheme=aspect.scheme)
 
             elif isinstance(aspect,xbrl.PeriodAspectValue):
                 if aspect.period_type == xbrl.PeriodType.INSTANT:
-                    html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=aspect.instant.strftime('%d. %B %Y')))
+                    yield aspect.instant.strftime('%d. %B %Y')
                 elif aspect.period_type == xbrl.PeriodType.START_END:
-                    html.append('<{element} class="label">{from_} to {to}</{element}>\n'.format(element=html_element, from_=aspect.start.strftime('%d. %B %Y'), to=aspect.end.strftime('%d. %B %Y')))
+                    yield '{from_} to {to}'.format(from_=aspect.start.strftime('%d. %B %Y'), to=aspect.end.strftime('%d. %B %Y'))
                 elif aspect.period_type == xbrl.PeriodType.FOREVER:
-                    html.append('<{element} class="label">Forever</{element}>\n'.format(element=html_element))
+                    yield 'Forever'
 
             elif isinstance(aspect,xbrl.SegmentAspectValue) or isinstance(aspect,xbrl.ScenarioAspectValue):
                 for elem in aspect.elements:
-                    html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=xml_escape(serialize_element(elem))))
+                    yield serialize_element(elem)
 
             elif isinstance(aspect,xbrl.UnitAspectValue):
                 text = ''
@@ -170,33 +197,63 @@ def generate_label(html, header, html_element='span', label_role=None, additiona
                             text += unit_symbols[qname]
                         else:
                             text += '{%s}:%s ' % (qname.namespace_name, qname.local_name)
-                html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=xml_escape(text)))
+                yield text
 
             elif isinstance(aspect,xbrl.ExplicitDimensionAspectValue):
                 if aspect.value:
-                    html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=xml_escape(concept_label(aspect.value, label_role, lang))))
+                    yield concept_label(aspect.value, label_role, lang)
                 else:
-                    html.append('<{element} class="label">Absent</{element}>\n'.format(element=html_element))
+                    yield 'Absent'
             elif isinstance(aspect,xbrl.TypedDimensionAspectValue):
                 if aspect.value:
-                    html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=xml_escape(serialize_element(aspect.value,False))))
+                    yield serialize_element(aspect.value,False)
                 else:
-                    html.append('<{element} class="label">Absent</{element}>\n'.format(element=html_element))
+                    yield 'Absent'
+
+def generate_label(html, header, html_element='span', label_role=None, additional_label_role=None, lang=None):
+    for label in header_labels(header, label_role, additional_label_role, lang):
+        html.append('<{element} class="label">{value}</{element}>\n'.format(element=html_element, value=xml_escape(label)))
+
+def slice_label_path(axis, index, label_role=None, additional_label_role=None, lang=None):
+    # Returns the labels of all header cells along the given slice as a single string
+    labels = []
+    for header in axis.slice(index):
+        labels.extend(header_labels(header, label_role, additional_label_role, lang))
+    return ' / '.join(labels)
+
+def fact_raw_value(fact):
+    if fact.xsi_nil or isinstance(fact.concept, xbrl.taxonomy.Tuple):
+        return ''
+    return fact.normalized_value
+
+def fact_display_value(fact, label_role=None, lang=None):
+    if fact.xsi_nil:
+        return 'N/A'
+    elif isinstance(fact.concept, xbrl.taxonomy.Tuple):
+        return fact.concept.name
+    elif fact.concept.is_enum():
+        return concept_label(fact.enum_value, label_role, lang)
+    elif fact.concept.is_numeric():
+        return str(fact.effective_numeric_value)
+    return fact.normalized_value
+
+def fact_key(fact):
+    # Identifies a fact by its aspects independent of its value, so that the key is stable across edits of the fact value
+    unit = fact.unit.id if fact.concept.is_numeric() and fact.unit else ''
+    return '%s|%s|%s' % (fact.concept.qname, fact.context.id, unit)
+
+def generate_cell_start(html, facts, cell_id=None, cells=None):
+    # Cells with facts get an id and are recorded for the fact-to-cell index if requested
+    if cells is not None and len(facts):
+        cells.append((cell_id, [fact_key(fact) for fact in facts if not isinstance(fact.concept, xbrl.taxonomy.Tuple)]))
+        html.append('<td id="%s">\n' % xml_escape(cell_id))
+    else:
+        html.append('<td>\n')
 
 def generate_cell_data(html, facts, label_role=None, lang=None):
     if len(facts):
         for fact in facts:
-            if fact.xsi_nil:
-                value = 'N/A'
-            elif isinstance(fact.concept, xbrl.taxonomy.Tuple):
-                value = fact.concept.name
-            elif fact.concept.is_enum():
-                value = concept_label(fact.enum_value, label_role, lang)
-            elif fact.concept.is_numeric():
-                value = str(fact.effective_numeric_value)
-            else:
-                value = fact.normalized_value
-            html.append('<p class="fact">%s</p>\n' % xml_escape(value))
+            html.append('<p class="fact">%s</p>\n' % xml_escape(fact_display_value(fact, label_role, lang)))
     else:
         html.append('&#xA0;') # No-Break Space
                     
@@ -297,75 +354,417 @@ def generate_table_head(html, dts, table, label_role=None, additional_label_role
         html.append('</tr>\n')
     html.append('</thead>\n')
 
-def generate_table_body(html, table, y_range, z, label_role=None, additional_label_role=None, lang=None):
+def generate_row_header(html, y_axis, header, rowspan, label_role=None, additional_label_role=None, lang=None, labels=None):
+    # labels optionally caches the rendered label of each header, so that headers repeated in several parts are only resolved once
+    if header.structural_node.is_rollup():
+        if not header.parent.structural_node.is_rollup() and not header_with_only_rollup_children(header.parent):
+            html.append('<th colspan="%d" rowspan="%d" class="rollup">\n' % (y_axis.row_count - header.row, rowspan))
+        else:
+            return
+    else:
+        colspan = y_axis.row_count - header.row if header_with_only_rollup_children(header) else 1
+        html.append('<th colspan="%d" rowspan="%d">\n' % (colspan, rowspan))
+        if labels is None:
+            generate_label(html, header, 'span', label_role, additional_label_role, lang)
+        else:
+            label = labels.get((header.row, header.slice))
+            if label is None:
+                label = labels[(header.row, header.slice)] = []
+                generate_label(label, header, 'span', label_role, additional_label_role, lang)
+            html.extend(label)
+    html.append('</th>\n')
+
+def generate_table_body(html, table, rows, label_role=None, additional_label_role=None, lang=None, labels=None):
+    # rows is a list of (y, data cells) tuples, the vertical header spans are clipped to the given rows
     y_axis = table.axis(Y)
+    kept = [y for y, row_html in rows]
 
     html.append('<tbody>\n')
+    emitted_headers = set()
     # For each slice on the y-axis
-    for y in y_range:
+    for y, row_html in rows:
         html.append('<tr>\n')
         # For each header row in the y-axis slice
         for header in y_axis.slice(y):
-            # Only generate <th> elements in rows where the header cell starts a vertical span
-            if header.slice == y:
-                if header.structural_node.is_rollup():
-                    if not header.parent.structural_node.is_rollup() and not header_with_only_rollup_children(header.parent):
-                        html.append('<th colspan="%d" rowspan="%d" class="rollup">\n' % (y_axis.row_count - header.row, header.span))
-                    else:
-                        continue
-                else:
-                    colspan = y_axis.row_count - header.row if header_with_only_rollup_children(header) else 1
-                    html.append('<th colspan="%d" rowspan="%d">\n' % (colspan, header.span))
-                    generate_label(html, header, 'span', label_role, additional_label_role, lang)
-                html.append('</th>\n')
-        # Data cells with fact values
-        for x in range(table.axis(X).slice_count):
-            html.append('<td>\n')
-            generate_cell_data(html, table.cell(x,y,z).facts, label_role, lang)
-            html.append('</td>\n')
+            # Only generate <th> elements in the first given row of the header's vertical span
+            if (header.row, header.slice) in emitted_headers:
+                continue
+            emitted_headers.add((header.row, header.slice))
+            # Only count the given rows within the header's vertical span
+            rowspan = bisect.bisect_left(kept, header.slice + header.span) - bisect.bisect_left(kept, header.slice)
+            generate_row_header(html, y_axis, header, rowspan, label_role, additional_label_role, lang, labels)
+        html.extend(row_html)
         html.append('</tr>\n')
     html.append('</tbody>\n')
-    
-def generate_table(cmdlArgs, instance, deftable, params):
+
+def generate_row_cells(table, y, z, label_role=None, lang=None, cell_prefix=None, cells=None):
+    html = []
+    # Data cells with fact values
+    for x in range(table.axis(X).slice_count):
+        facts = table.cell(x,y,z).facts
+        generate_cell_start(html, facts, '%s-%d-%d-%d' % (cell_prefix, x, y, z) if cells is not None else None, cells)
+        generate_cell_data(html, facts, label_role, lang)
+        html.append('</td>\n')
+    return html
+
+def generate_sparse_row_cells(table, y, z, label_role=None, lang=None, cell_prefix=None, cells=None):
+    # Returns None for rows without any facts, which are dropped from the output
+    # The layout model offers no way to enumerate only the non-empty cells, so the facts of every cell of the row are queried
+    x_count = table.axis(X).slice_count
+    row_cells = [table.cell(x,y,z).facts for x in range(x_count)]
+    if not any(len(facts) for facts in row_cells):
+        return None
+
+    html = []
+    # Data cells with fact values, runs of empty cells are merged into a single cell
+    x = 0
+    while x < x_count:
+        if len(row_cells[x]):
+            generate_cell_start(html, row_cells[x], '%s-%d-%d-%d' % (cell_prefix, x, y, z) if cells is not None else None, cells)
+            generate_cell_data(html, row_cells[x], label_role, lang)
+            html.append('</td>\n')
+            x += 1
+        else:
+            start = x
+            while x < x_count and not len(row_cells[x]):
+                x += 1
+            html.append('<td colspan="%d">&#xA0;</td>\n' % (x - start))
+    return html
+
+def html_size(html):
+    return sum(len(s.encode('utf-8')) for s in html)
+
+def render_slice(dts, table, z, max_rows, max_bytes, generate_row, label_role=None, additional_label_role=None, lang=None, cell_prefix=None):
+    # Renders all parts of one z-slice into separate buffers, the slices of a table are independent of each other
+    # A new part is started whenever the next row would exceed max_rows rows or roughly max_bytes bytes of UTF-8 encoded HTML
+    # Headers spanning rows of several parts are repeated at the start of each part with their rowspan clipped to the part
+    # Each part is returned together with the (cell id, fact keys) entries of its cells if a cell_prefix is given
+    y_axis = table.axis(Y)
+    x_count = table.axis(X).slice_count
+    slice_timings = {'head': 0.0, 'body': 0.0, 'cells': 0}
+
+    # The caption and head are the same for all parts of the slice
+    start = time.perf_counter()
+    head = []
+    generate_table_caption(head, table, z, label_role, additional_label_role, lang)
+    generate_table_head(head, dts, table, label_role, additional_label_role, lang)
+    head_size = html_size(head) + len('<table>\n<tbody>\n</tbody>\n</table>\n')
+    slice_timings['head'] += time.perf_counter() - start
+
+    def headers_size(y, emitted_headers):
+        # Size of the <th> elements the row adds to a part that already contains the given headers
+        html = []
+        for header in y_axis.slice(y):
+            if (header.row, header.slice) not in emitted_headers:
+                generate_row_header(html, y_axis, header, header.span, label_role, additional_label_role, lang, labels)
+        return html_size(html)
+
+    labels = {}
+    parts = []
+    part = None
+    start = time.perf_counter()
+    for y in range(y_axis.slice_count):
+        row_cells = [] if cell_prefix is not None else None
+        row_html = generate_row(table, y, z, label_role, lang, cell_prefix, row_cells)
+        # Counts the queried cells, which is the full grid in sparse mode too
+        slice_timings['cells'] += x_count
+        if row_html is None:
+            continue
+        size = html_size(row_html) + len('<tr>\n</tr>\n')
+        if part and len(part['rows']) >= max_rows:
+            parts.append(finish_part(head, part, table, label_role, additional_label_role, lang, labels))
+            part = None
+        if max_bytes:
+            headers = headers_size(y, part['headers'] if part else ())
+            if part and part['size'] + size + headers > max_bytes:
+                parts.append(finish_part(head, part, table, label_role, additional_label_role, lang, labels))
+                part = None
+                # All headers of the row are emitted at the start of the new part
+                headers = headers_size(y, ())
+            size += headers
+        if part is None:
+            part = {'rows': [], 'headers': set(), 'size': head_size, 'cells': [] if cell_prefix is not None else None}
+        if max_bytes:
+            part['headers'].update((header.row, header.slice) for header in y_axis.slice(y))
+        part['rows'].append((y, row_html))
+        part['size'] += size
+        if row_cells:
+            part['cells'].extend(row_cells)
+    if part:
+        parts.append(finish_part(head, part, table, label_role, additional_label_role, lang, labels))
+    slice_timings['body'] += time.perf_counter() - start
+    return parts, slice_timings
+
+def finish_part(head, part, table, label_role=None, additional_label_role=None, lang=None, labels=None):
+    html = ['<table>\n']
+    html.extend(head)
+    generate_table_body(html, table, part['rows'], label_role, additional_label_role, lang, labels)
+    html.append('</table>\n')
+    return html, part['cells']
+
+def map_bounded(executor, fn, items, window):
+    # Like executor.map, but only keeps about window tasks in flight, so that finished results do not pile up while the caller consumes them in order
+    futures = collections.deque()
+    for item in items:
+        futures.append(executor.submit(fn, item))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+def write_index(cmdlArgs, index):
+    # Write an index page with links to all generated files of all tables
+    body = ['<h1>Tables</h1>\n', '<ul>\n']
+    for table_id, label, files in index:
+        body.append('<li><span class="label">%s</span>\n' % xml_escape('%s (%s)' % (label, table_id) if label else table_id))
+        body.append('<ul>\n')
+        for filename, description in files:
+            body.append('<li><a href="%s">%s</a></li>\n' % (xml_escape(filename), xml_escape(description)))
+        body.append('</ul>\n</li>\n')
+    body.append('</ul>\n')
+    return write_html(cmdlArgs, 'index.html', body)
+
+def new_table_timings(deftable):
+    # Collects the time spent in each phase (in seconds) and the amount of generated output for one definition table
+    return {
+        'table': deftable.id,
+        'layout': 0.0,
+        'head': 0.0,
+        'body': 0.0,
+        'csv': 0.0,
+        'hash': 0.0,
+        'write': 0.0,
+        'cells': 0,
+        'bytes': 0,
+        'skipped': False,
+        'over_budget': False,
+        'estimate': None,
+        'files': []
+    }
+
+def write_timed_html(cmdlArgs, filename, body, timings, description=None):
+    start = time.perf_counter()
+    timings['bytes'] += write_html(cmdlArgs, filename, body)
+    timings['write'] += time.perf_counter() - start
+    if description:
+        timings['files'].append((filename, description))
+
+def write_timings(cmdlArgs, timings, output_timings, runtime):
+    # Per-table figures plus the totals, which also include writing the combined output file in single-output mode
+    total = {key: sum(t[key] for t in timings) for key in ('layout', 'head', 'body', 'csv', 'hash', 'write', 'cells', 'bytes')}
+    total['write'] += output_timings['write']
+    total['bytes'] += output_timings['bytes']
+    summary = {
+        'runtime': runtime,
+        'total': total,
+        'tables': timings
+    }
+    path = os.path.join(cmdlArgs.OUTPUT_DIR, 'timings.json')
+    with open(path,'w',encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+def table_state_path(cmdlArgs):
+    return os.path.join(cmdlArgs.OUTPUT_DIR, 'table_hashes.json')
+
+def load_table_hashes(cmdlArgs):
+    # Returns the table hashes recorded by the previous incremental run
+    try:
+        with open(table_state_path(cmdlArgs),'r',encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_table_hashes(cmdlArgs, hashes):
+    with open(table_state_path(cmdlArgs),'w',encoding='utf-8') as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+
+def table_files_path(cmdlArgs):
+    return os.path.join(cmdlArgs.OUTPUT_DIR, 'table_files.json')
+
+def load_table_files(cmdlArgs):
+    # Returns the label and the generated files of each table recorded by previous runs into the output directory
+    try:
+        with open(table_files_path(cmdlArgs),'r',encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_table_files(cmdlArgs, table_files):
+    with open(table_files_path(cmdlArgs),'w',encoding='utf-8') as f:
+        json.dump(table_files, f, indent=2, sort_keys=True)
+
+def table_set_hash(cmdlArgs, tables):
+    # Hash the rendering options, the shape of each layout table and the displayed value of every fact in its cells
+    lang = cmdlArgs.lang
+    label_role = cmdlArgs.label_role
+    h = hashlib.sha256()
+    h.update(repr((lang, label_role, cmdlArgs.additional_label_role, cmdlArgs.max_rows, cmdlArgs.max_bytes, cmdlArgs.csv, cmdlArgs.sparse, cmdlArgs.cell_index)).encode('utf-8'))
+    for table_idx, table in enumerate(tables):
+        x_count, y_count, z_count = table.axis(X).slice_count, table.axis(Y).slice_count, table.axis(Z).slice_count
+        h.update(('table %d %d %d %d\n' % (table_idx, x_count, y_count, z_count)).encode('utf-8'))
+        for z in range(z_count):
+            for y in range(y_count):
+                for x in range(x_count):
+                    for fact in table.cell(x,y,z).facts:
+                        h.update(('%d %d %d %s %s\n' % (x, y, z, fact.concept.qname, fact_display_value(fact, label_role, lang))).encode('utf-8'))
+    return h.hexdigest()
+
+# Number of rows/columns assumed for a concept relationship node, whose size is only known after resolving its relationships
+relationship_node_estimate = 10
+
+def table_network(dts, definition_table, arc_name, arcrole):
+    return dts.network_of_relationships(
+        definition_table.extended_link.qname,
+        definition_table.extended_link.xlink_role,
+        xml.QName(arc_name, "http://xbrl.org/2014/table"),
+        arcrole
+        )
+
+def new_size_estimator(instance):
+    # Shared state for estimating the size of the definition tables of one instance
+    dts = instance.dts
+    return {
+        'instance': instance,
+        'drs': dts.dimensional_relationship_set(),
+        'linkroles': list(dts.definition_link_roles(None)),
+        'members': {},
+        'aspect_values': None
+    }
+
+def dimension_member_count(estimator, dimension):
+    # Largest number of domain members of the dimension in any definition link role
+    count = estimator['members'].get(dimension.qname)
+    if count is None:
+        drs = estimator['drs']
+        count = 0
+        for linkrole in estimator['linkroles']:
+            members = set()
+            stack = [rel.target for rel in drs.dimension_domain_relationships(dimension, linkrole)]
+            while stack:
+                member = stack.pop()
+                if member.qname in members:
+                    continue
+                members.add(member.qname)
+                stack.extend(rel.target for rel in drs.domain_member_relationships(member, linkrole))
+            count = max(count, len(members))
+        estimator['members'][dimension.qname] = count
+    return count
+
+def instance_aspect_value_count(estimator):
+    # Upper bound for the number of values of a non-dimensional aspect: the number of reported concepts, contexts or units
+    if estimator['aspect_values'] is None:
+        instance = estimator['instance']
+        concepts = set(fact.concept.qname for fact in instance.facts)
+        estimator['aspect_values'] = max(1, len(concepts), sum(1 for _ in instance.contexts), sum(1 for _ in instance.units))
+    return estimator['aspect_values']
+
+def estimate_node_size(estimator, subtree_network, node):
+    # Number of leaf rows/columns the definition node and its subtree expand to
+    if isinstance(node, xbrl.table.AspectNode):
+        size = 1
+        for aspect in node.participating_aspects:
+            count = dimension_member_count(estimator, aspect) if isinstance(aspect, xbrl.taxonomy.Dimension) else 0
+            size = max(size, count if count else instance_aspect_value_count(estimator))
+        return size
+    if isinstance(node, xbrl.table.DimensionRelationshipNode):
+        return max(1, dimension_member_count(estimator, node.dimension))
+    if isinstance(node, xbrl.table.ConceptRelationshipNode):
+        return relationship_node_estimate
+    # Rule nodes contribute a single row/column unless they only group their child nodes
+    children = [rel.target for rel in subtree_network.relationships_from(node)] if subtree_network else []
+    return max(1, sum(estimate_node_size(estimator, subtree_network, child) for child in children))
+
+def estimate_table_size(estimator, deftable):
+    # Cheap estimate of the x/y/z cardinality of a definition table derived from its breakdown trees, without generating the layout model
+    dts = estimator['instance'].dts
+    table_breakdown_network = table_network(dts, deftable, "tableBreakdownArc", "http://xbrl.org/arcrole/2014/table-breakdown")
+    breakdown_tree_network = table_network(dts, deftable, "breakdownTreeArc", "http://xbrl.org/arcrole/2014/breakdown-tree")
+    subtree_network = table_network(dts, deftable, "definitionNodeSubtreeArc", "http://xbrl.org/arcrole/2014/definition-node-subtree")
+
+    estimate = {'x': 1, 'y': 1, 'z': 1}
+    if table_breakdown_network:
+        for table_breakdown_rel in table_breakdown_network.relationships_from(deftable):
+            axis = table_breakdown_rel.arc.element.find_attribute('axis')
+            axis = axis.normalized_value if axis else 'x'
+            breakdown_size = 0
+            if breakdown_tree_network:
+                for breakdown_tree_rel in breakdown_tree_network.relationships_from(table_breakdown_rel.target):
+                    breakdown_size += estimate_node_size(estimator, subtree_network, breakdown_tree_rel.target)
+            # Multiple breakdowns on the same axis are combined as a cartesian product
+            estimate[axis] = estimate.get(axis, 1) * max(1, breakdown_size)
+    estimate['cells'] = estimate['x'] * estimate['y'] * estimate['z']
+    return estimate
+
+def generate_table(cmdlArgs, instance, deftable, params, timings, hashes=None, cell_index=None):
     single_output_file = cmdlArgs.single_output
     lang = cmdlArgs.lang
     label_role = cmdlArgs.label_role
     additional_label_role = cmdlArgs.additional_label_role
     max_rows = 10000 if cmdlArgs.max_rows is None else cmdlArgs.max_rows
-
-    print(label_role)
+    max_bytes = cmdlArgs.max_bytes
+    generate_row = generate_sparse_row_cells if cmdlArgs.sparse else generate_row_cells
+    slice_workers = cmdlArgs.slice_workers
 
     body = []
     
     # Create layout model for the given definition table
     print('Calculating table layout for table "%s"...' % deftable.id)
+    start = time.perf_counter()
     (tableset, errorlog) = deftable.generate_layout_model(instance, **params)
+    timings['layout'] = time.perf_counter() - start
     if errorlog.has_errors():
         # Catch any errors during table resolution and layout process
         body.extend('<p class="error">%s</p>\n' % error.text.replace('\n','</br>') for error in errorlog.errors)
         if not single_output_file:
-            write_html(cmdlArgs, deftable.id+'.html', body)
+            write_timed_html(cmdlArgs, deftable.id+'.html', body, timings, 'Errors')
             body = []
     else:
+        if hashes is not None:
+            # In incremental mode, skip rendering if none of the fact values used by the table changed since the previous run
+            tableset = list(tableset)
+            start = time.perf_counter()
+            digest = table_set_hash(cmdlArgs, tableset)
+            timings['hash'] = time.perf_counter() - start
+            previous = hashes.get(deftable.id)
+            if isinstance(previous, dict) and previous['hash'] == digest:
+                print('Table "%s" is unchanged, skipping...' % deftable.id)
+                timings['skipped'] = True
+                timings['files'] = previous['files']
+                return body
+            # The list of generated files is filled in while rendering
+            hashes[deftable.id] = {'hash': digest, 'files': timings['files']}
+
         table_idx = 0
         for table in tableset:
             print('Generating HTML for table "%s"...' % deftable.id)
             # Check for empty table after empty row/column elimination
             if not table.is_empty():
-                for z in range(table.axis(Z).slice_count):
-                    for y in range(0, table.axis(Y).slice_count, max_rows):
-                        body.append('<table>\n')    
-                        generate_table_caption(body, table, z, label_role, additional_label_role, lang)
-                        generate_table_head(body, instance.dts, table, label_role, additional_label_role, lang)
-                        generate_table_body(body, table, range(y,min(y+max_rows, table.axis(Y).slice_count)), z, label_role, additional_label_role, lang)
-                        body.append('</table>\n')
-                        if not single_output_file:
-                            write_html(cmdlArgs, '%s_%d_%d_%d.html' % (deftable.id, table_idx, z, y / max_rows), body)
-                            body = []
+                if cmdlArgs.csv:
+                    print('Generating CSV for table "%s"...' % deftable.id)
+                    start = time.perf_counter()
+                    timings['bytes'] += write_csv(cmdlArgs, '%s_%d.csv' % (deftable.id, table_idx), table, label_role, additional_label_role, lang)
+                    timings['csv'] += time.perf_counter() - start
+                cell_prefix = '%s-%d' % (deftable.id, table_idx) if cell_index is not None else None
+                def render(z):
+                    return render_slice(instance.dts, table, z, max_rows, max_bytes, generate_row, label_role, additional_label_role, lang, cell_prefix)
+                # Render the z-slices concurrently and assemble the output in z order, writing each slice before further slices are submitted
+                with concurrent.futures.ThreadPoolExecutor(max_workers=slice_workers) as executor:
+                    for z, (parts, slice_timings) in enumerate(map_bounded(executor, render, range(table.axis(Z).slice_count), slice_workers)):
+                        for key in ('head', 'body', 'cells'):
+                            timings[key] += slice_timings[key]
+                        for part, (html, cells) in enumerate(parts):
+                            filename = 'tables.html' if single_output_file else '%s_%d_%d_%d.html' % (deftable.id, table_idx, z, part)
+                            if cells is not None:
+                                for cell_id, keys in cells:
+                                    cell_index[cell_id] = {'table': deftable.id, 'file': filename, 'facts': keys}
+                            body.extend(html)
+                            if not single_output_file:
+                                write_timed_html(cmdlArgs, filename, body, timings, 'Layout table %d, slice %d, part %d' % (table_idx+1, z+1, part+1))
+                                body = []
             else:
                 body.append('<p class="error">Table %s is empty (no data found)!</p>\n' % deftable.id)
                 if not single_output_file:
-                    write_html(cmdlArgs, deftable.id+'.html', body)
+                    write_timed_html(cmdlArgs, deftable.id+'.html', body, timings, 'Empty table')
                     body = []
             table_idx += 1
             
@@ -381,36 +780,281 @@ def generate_tables(cmdlArgs, instance):
     # ensure output directory exists
     pathlib.Path(cmdlArgs.OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
 
+    hashes = load_table_hashes(cmdlArgs) if cmdlArgs.incremental else None
+    cell_index = {} if cmdlArgs.cell_index else None
+
     # Generate HTML output file for each definition table in the table linkbase
+    start = time.perf_counter()
+    # Only generate tables matching one of the given table id patterns
+    deftables = [deftable for deftable in instance.dts.tables if not cmdlArgs.table or any(fnmatch.fnmatchcase(deftable.id, pattern) for pattern in cmdlArgs.table)]
+    timings = [new_table_timings(deftable) for deftable in deftables]
+    results = [[] for deftable in deftables]
+
+    # Estimate the size of each table up front and process the largest tables first, so that heavy tables do not end up last on a single worker
+    estimator = new_size_estimator(instance)
+    for deftable, table_timings in zip(deftables, timings):
+        table_timings['estimate'] = estimate_table_size(estimator, deftable)
+    order = sorted(range(len(deftables)), key=lambda i: timings[i]['estimate']['cells'], reverse=True)
+
+    def process_table(i):
+        deftable, table_timings = deftables[i], timings[i]
+        estimate = table_timings['estimate']
+        if cmdlArgs.max_cells is not None and estimate['cells'] > cmdlArgs.max_cells:
+            print('WARNING: Skipping table "%s" with an estimated %d x %d x %d = %d cells' % (deftable.id, estimate['x'], estimate['y'], estimate['z'], estimate['cells']))
+            table_timings['over_budget'] = True
+            results[i] = ['<p class="error">Table %s was skipped because its estimated size of %d cells exceeds the limit of %d cells</p>\n' % (xml_escape(deftable.id), estimate['cells'], cmdlArgs.max_cells)]
+            if not single_output_file:
+                write_timed_html(cmdlArgs, deftable.id+'.html', results[i], table_timings, 'Skipped (too large)')
+            return
+        results[i] = generate_table(cmdlArgs, instance, deftable, params, table_timings, hashes, cell_index)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=cmdlArgs.table_workers) as executor:
+        # Consume the results to propagate exceptions raised by the workers
+        list(executor.map(process_table, order))
+
+    # Assemble the output in definition table order, independent of the processing order
     body = []
-    for deftable in instance.dts.tables:
-        table = generate_table(cmdlArgs, instance, deftable, params)
+    table_files = load_table_files(cmdlArgs) if not single_output_file else {}
+    for deftable, table_timings, table in zip(deftables, timings, results):
         if single_output_file:
             body.extend(table)
+        else:
+            table_files[deftable.id] = {'label': format_label(deftable, cmdlArgs.label_role, cmdlArgs.additional_label_role, cmdlArgs.lang), 'files': table_timings['files']}
+    # The index also links the files of tables generated by previous runs, e.g. tables excluded by --table in this run
+    index = [(deftable.id, table_files[deftable.id]['label'], table_files[deftable.id]['files']) for deftable in instance.dts.tables if deftable.id in table_files]
 
+    if hashes is not None:
+        save_table_hashes(cmdlArgs, hashes)
+
+    if cell_index is not None:
+        # Keep the index entries of tables that were not rendered in this run, because they were skipped in incremental mode or excluded by --table
+        kept = set(deftable.id for deftable in instance.dts.tables) - set(t['table'] for t in timings if not t['skipped'])
+        for cell_id, cell in load_cell_index(cmdlArgs)['cells'].items():
+            if cell['table'] in kept:
+                cell_index[cell_id] = cell
+        save_cell_index(cmdlArgs, cell_index)
+
+    output_timings = {'write': 0.0, 'bytes': 0}
     if single_output_file:
-        write_html(cmdlArgs, 'tables.html', body)
+        write_timed_html(cmdlArgs, 'tables.html', body, output_timings)
+    else:
+        start_index = time.perf_counter()
+        save_table_files(cmdlArgs, table_files)
+        output_timings['bytes'] += write_index(cmdlArgs, index)
+        output_timings['write'] += time.perf_counter() - start_index
+
+    write_timings(cmdlArgs, timings, output_timings, time.perf_counter() - start)
+
+
+def cell_index_path(cmdlArgs):
+    return os.path.join(cmdlArgs.OUTPUT_DIR, 'cell_index.json')
+
+def load_cell_index(cmdlArgs):
+    try:
+        with open(cell_index_path(cmdlArgs),'r',encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'facts': {}, 'cells': {}}
+
+def save_cell_index(cmdlArgs, cell_index):
+    # Store the reverse index from each fact to the cells it appears in together with the cells themselves
+    facts = {}
+    for cell_id, cell in cell_index.items():
+        for key in cell['facts']:
+            facts.setdefault(key, []).append(cell_id)
+    with open(cell_index_path(cmdlArgs),'w',encoding='utf-8') as f:
+        json.dump({'facts': facts, 'cells': cell_index}, f)
+
+cell_pattern = re.compile(r'<td id="([^"]*)">\n.*?</td>\n', re.DOTALL)
+
+def update_cells(cmdlArgs, instance, changed_fact_keys):
+    # Re-renders only the <td> fragments of the cells showing one of the changed facts in the previously generated output
+    index = load_cell_index(cmdlArgs)
+    affected = {}
+    for key in changed_fact_keys:
+        for cell_id in index['facts'].get(key, []):
+            cell = index['cells'][cell_id]
+            affected.setdefault(cell['file'], {})[xml_escape(cell_id)] = cell['facts']
+
+    # Look up the current facts of all affected cells in a single pass over the instance
+    needed = set(key for cells in affected.values() for keys in cells.values() for key in keys)
+    facts = {}
+    for fact in instance.facts:
+        if not isinstance(fact.concept, xbrl.taxonomy.Tuple):
+            key = fact_key(fact)
+            if key in needed:
+                facts.setdefault(key, []).append(fact)
 
+    def render_cell(match):
+        keys = cells.get(match.group(1))
+        if keys is None:
+            return match.group(0)
+        html = ['<td id="%s">\n' % match.group(1)]
+        generate_cell_data(html, [fact for key in keys for fact in facts.get(key, [])], cmdlArgs.label_role, cmdlArgs.lang)
+        html.append('</td>\n')
+        return ''.join(html)
 
-def load_instance(cmdlArgs):
+    for filename, cells in affected.items():
+        path = os.path.join(cmdlArgs.OUTPUT_DIR, filename)
+        with open(path,'r',encoding='utf-8') as f:
+            text = f.read()
+        with open(path,'w',encoding='utf-8') as f:
+            f.write(cell_pattern.sub(render_cell, text))
+        print('Updated %d cells in "%s"' % (len(cells), filename))
+
+XBRL_XML = "https://xbrl.org/2021/xbrl-xml"
+XBRL_CSV = "https://xbrl.org/2021/xbrl-csv"
+XBRL_JSON = "https://xbrl.org/2021/xbrl-json"
+
+def hash_files(paths, report_id=''):
+    h = hashlib.sha256(report_id.encode('utf-8'))
+    for path in paths:
+        h.update(os.path.basename(path).encode('utf-8'))
+        with open(path,'rb') as f:
+            for chunk in iter(lambda: f.read(1024*1024), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+def converted_xml_cache_path(cache_dir, sources, report_id=''):
+    # Only local input files can be hashed cheaply
+    if not all(os.path.isfile(source) for source in sources):
+        return None
+    return os.path.join(cache_dir, hash_files(sorted(sources), report_id) + '.xbrl')
+
+def csv_metadata_sources(path, seen=None):
+    # Returns the local xBRL-CSV metadata file, the local metadata files it extends and the CSV tables referenced by any of them
+    # Remote metadata files (usually published with the taxonomy) are treated as immutable and not hashed
+    path = os.path.abspath(path)
+    seen = set() if seen is None else seen
+    if path in seen:
+        return []
+    seen.add(path)
+    with open(path,'r',encoding='utf-8') as f:
+        metadata = json.load(f)
+    sources = [path]
+    # Relative URLs are resolved against the metadata file that contains them
+    base_dir = os.path.dirname(path)
+    for url in metadata.get('documentInfo', {}).get('extends', []):
+        if '://' not in url:
+            sources.extend(csv_metadata_sources(os.path.join(base_dir, url), seen))
+    for table in metadata.get('tables', {}).values():
+        url = table.get('url')
+        if url and '://' not in url:
+            sources.append(os.path.join(base_dir, url))
+    return sources
+
+taxonomy_href_pattern = re.compile(r'''(<(?:[\w.-]+:)?(?:schemaRef|linkbaseRef|roleRef|arcroleRef)\b[^>]*?href\s*=\s*)(["'])([^"']*)\2''')
+
+def write_converted_xml(cache_path, xmlDoc, docURL):
+    pathlib.Path(os.path.dirname(cache_path)).mkdir(parents=True, exist_ok=True)
+    # The cached document is loaded from the cache directory, so relative taxonomy references are made absolute against the original document
+    base = pathlib.Path(os.path.abspath(docURL)).as_uri() if os.path.isfile(docURL) else docURL.replace('\\','/')
+    # The serialized href values are already escaped, so the base is escaped the same way before joining
+    base = xml_escape(base)
+    def absolute_href(match):
+        return '%s%s%s%s' % (match.group(1), match.group(2), urllib.parse.urljoin(base, match.group(3)), match.group(2))
+    # Write to a temporary file first, so that an interrupted run never leaves a truncated cache entry behind
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path,'w',encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write(taxonomy_href_pattern.sub(absolute_href, xmlDoc.document_element.serialize()))
+    os.replace(tmp_path, cache_path)
+
+def resolve_documents(file):
+    # Returns a (name, docURL, sources, report_id) tuple for each report to be processed
     # try to load report package
-    reportPackage, log = xbrl.ReportPackage.create_from_url(cmdlArgs.FILE)
-    docURL = cmdlArgs.FILE
+    reportPackage, log = xbrl.ReportPackage.create_from_url(file)
     if reportPackage and not log.has_errors():
         reportInfos = list(reportPackage.report_infos)
-        if len(reportInfos) != 1:
-            raise Exception("Only report package containing exactly one report are supported!")
-        ri = reportInfos[0]
-        if ri.report_type == xbrl.ReportType.IXBRL:
-            raise Exception("Inline XBRL reports are not supported!")
-        if len(ri.document_urls) != 1:
-            raise Exception("Only reports with one input file are supported!")
-        docURL = ri.document_urls[0]
+        if len(reportInfos) == 0:
+            raise Exception("Report package does not contain any reports!")
+        documents = []
+        names = set()
+        for idx, ri in enumerate(reportInfos):
+            if ri.report_type == xbrl.ReportType.IXBRL:
+                raise Exception("Inline XBRL reports are not supported!")
+            if len(ri.document_urls) != 1:
+                raise Exception("Only reports with one input file are supported!")
+            docURL = ri.document_urls[0]
+            name = os.path.splitext(os.path.basename(docURL.replace('\\','/')))[0]
+            if name in names:
+                name = '%s_%d' % (name, idx)
+            names.add(name)
+            # the files the converted xBRL-XML document depends on
+            documents.append((name, docURL, [file], str(idx)))
+        return documents
+    return [(None, file, None, '')]
 
+def read_document_head(file, docURL, size=1024*1024):
+    # Returns the first bytes of the input document, which may be a file within a report package
+    if os.path.isfile(docURL):
+        with open(docURL,'rb') as f:
+            return f.read(size)
+    if os.path.isfile(file) and zipfile.is_zipfile(file):
+        url = docURL.replace('\\','/')
+        with zipfile.ZipFile(file) as package:
+            for name in package.namelist():
+                if url.endswith('/' + name):
+                    with package.open(name) as f:
+                        return f.read(size)
+    return None
+
+taxonomy_ref_pattern = re.compile(rb'''<(?:[\w.-]+:)?(?:schemaRef|linkbaseRef)\b[^>]*?href\s*=\s*["']([^"']+)|"(?:taxonomy|extends)"\s*:\s*\[([^\]]*)\]''')
+
+def taxonomy_key(file, docURL):
+    # Cheaply determines the taxonomy referenced by the input document (schemaRef/linkbaseRef or OIM taxonomy/extends), without loading the DTS
+    # The key is the sorted set of all references resolved against the document location
+    head = read_document_head(file, docURL)
+    if not head:
+        return None
+    base = pathlib.Path(os.path.abspath(docURL)).as_uri() if os.path.isfile(docURL) else docURL.replace('\\','/')
+    refs = set()
+    for href, hrefs in taxonomy_ref_pattern.findall(head):
+        for ref in [href] if href else re.findall(rb'"([^"]+)"', hrefs):
+            refs.add(urllib.parse.urljoin(base, ref.decode('utf-8').strip()))
+    return tuple(sorted(refs)) if refs else None
+
+# DTSes shared by all worker threads of the process, keyed by taxonomy_key, so that each taxonomy is only loaded once
+warm_dts = {}
+warm_dts_lock = threading.Lock()
+
+def load_instance(cmdlArgs, docURL, sources, report_id=''):
+    key = taxonomy_key(cmdlArgs.FILE, docURL)
+    if not key:
+        return load_document(cmdlArgs, docURL, sources, report_id)
+    with warm_dts_lock:
+        entry = warm_dts.setdefault(key, {'lock': threading.Lock(), 'dts': None})
+    # The first report of a taxonomy loads the DTS, concurrent reports for the same taxonomy wait for it and then reuse it
+    with entry['lock']:
+        if entry['dts'] is None:
+            instance = load_document(cmdlArgs, docURL, sources, report_id)
+            entry['dts'] = instance.dts
+            return instance
+    return load_document(cmdlArgs, docURL, sources, report_id, entry['dts'])
+
+def load_document(cmdlArgs, docURL, sources, report_id, dts=None):
     docType = oim.OIM.detect_document_type(docURL)
+    # An already loaded DTS is only passed to the xBRL instance loaders (the dts option corresponds to InstanceSettings.DTS),
+    # the OIM loaders always load the taxonomy themselves
+    options = {'dts': dts} if dts else {}
+
+    # Reuse a previously converted xBRL-XML document if the input files did not change
+    cache_path = None
+    if cmdlArgs.cache_dir and docType in (XBRL_CSV, XBRL_JSON):
+        if sources is None:
+            sources = [docURL]
+            if docType == XBRL_CSV and os.path.isfile(docURL):
+                # The CSV tables and extended metadata files referenced by the metadata file
+                sources = csv_metadata_sources(docURL)
+        cache_path = converted_xml_cache_path(cmdlArgs.cache_dir, sources, report_id)
+        if cache_path and os.path.isfile(cache_path):
+            print('Loading cached xBRL-XML document "%s"...' % cache_path)
+            docURL = cache_path
+            docType = XBRL_XML
+
     match docType:
         case "https://xbrl.org/2021/xbrl-xml":
-            instance, log = xbrl.Instance.create_from_url(docURL)
+            instance, log = xbrl.Instance.create_from_url(docURL, **options)
             if log.has_errors():
                 raise Exception(str(log))
             return instance
@@ -422,7 +1066,9 @@ def load_instance(cmdlArgs):
             xmlDoc = oimInstance.to_xml()
             if not xmlDoc:
                 raise Exception("Conversion to xBRL-XML failed!")
-            instance, log = xbrl.Instance.create_from_document(xmlDoc)
+            if cache_path:
+                write_converted_xml(cache_path, xmlDoc, docURL)
+            instance, log = xbrl.Instance.create_from_document(xmlDoc, **options)
             if log.has_errors():
                 raise Exception(str(log))
             return instance
@@ -434,7 +1080,9 @@ def load_instance(cmdlArgs):
             xmlDoc = oimInstance.to_xml()
             if not xmlDoc:
                 raise Exception("Conversion to xBRL-XML failed!")
-            instance, log = xbrl.Instance.create_from_document(xmlDoc)
+            if cache_path:
+                write_converted_xml(cache_path, xmlDoc, docURL)
+            instance, log = xbrl.Instance.create_from_document(xmlDoc, **options)
             if log.has_errors():
                 raise Exception(str(log))
             return instance
@@ -443,21 +1091,117 @@ def load_instance(cmdlArgs):
             raise Exception("Unknown document type: %s" % (docType))
 
 
+def collect_input_files(paths):
+    # Directories are expanded to the report packages they contain
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if os.path.splitext(name)[1].lower() in ('.zip', '.xbr')))
+        else:
+            files.append(path)
+    return files
+
+def process_report(cmdlArgs, docURL, sources, report_id):
+    instance = load_instance(cmdlArgs, docURL, sources, report_id)
+    if instance:
+        if cmdlArgs.update_facts:
+            update_cells(cmdlArgs, instance, cmdlArgs.update_facts)
+        else:
+            generate_tables(cmdlArgs, instance)
+
+def filing_reports(cmdlArgs):
+    # Returns a (cmdlArgs, docURL, sources, report_id) task for each report of the filing
+    documents = resolve_documents(cmdlArgs.FILE)
+    if len(documents) == 1:
+        name, docURL, sources, report_id = documents[0]
+        return [(cmdlArgs, docURL, sources, report_id)]
+
+    # The reports of a multi-report package are each rendered into their own subdirectory
+    tasks = []
+    for name, docURL, sources, report_id in documents:
+        reportArgs = copy.copy(cmdlArgs)
+        reportArgs.OUTPUT_DIR = os.path.join(cmdlArgs.OUTPUT_DIR, name)
+        tasks.append((reportArgs, docURL, sources, report_id))
+    return tasks
+
+def process_filing(cmdlArgs):
+    tasks = filing_reports(cmdlArgs)
+    if len(tasks) == 1:
+        process_report(*tasks[0])
+        return
+
+    # Load and render all reports of a multi-report package concurrently
+    with concurrent.futures.ThreadPoolExecutor(max_workers=cmdlArgs.workers) as executor:
+        futures = [executor.submit(process_report, *task) for task in tasks]
+        for future in futures:
+            future.result()
+
+def process_filings(cmdlArgs, files):
+    failed = set()
+    # All reports of all filings are processed by a single pool, the workers share the loaded DTSes through load_instance
+    with concurrent.futures.ThreadPoolExecutor(max_workers=cmdlArgs.workers) as executor:
+        futures = {}
+        pending = {}
+        for file in files:
+            # Generate the output for each filing into its own subdirectory
+            filingArgs = copy.copy(cmdlArgs)
+            filingArgs.FILE = file
+            filingArgs.OUTPUT_DIR = os.path.join(cmdlArgs.OUTPUT_DIR, os.path.splitext(os.path.basename(file))[0])
+            try:
+                tasks = filing_reports(filingArgs)
+            except Exception as e:
+                failed.add(file)
+                print('ERROR: Processing "%s" failed: %s' % (file, e))
+                continue
+            pending[file] = len(tasks)
+            for task in tasks:
+                futures[executor.submit(process_report, *task)] = file
+
+        for future in concurrent.futures.as_completed(futures):
+            file = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                failed.add(file)
+                print('ERROR: Processing "%s" failed: %s' % (file, e))
+            pending[file] -= 1
+            if not pending[file] and file not in failed:
+                print('Finished processing "%s"' % file)
+    print('Processed %d filings (%d failed)' % (len(files), len(failed)))
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='This script uses Altova RaptorXML+XBRL Python API v2 to generate HTML tables according to the layout specified in the XBRL Table linkbase.')
-    parser.add_argument('FILE', help="the xBRL-XML, xBRL-CSV or xBRL-JSON input file")
+    parser.add_argument('FILE', nargs='+', help="the xBRL-XML, xBRL-CSV or xBRL-JSON input file, or several report packages or directories containing report packages")
     parser.add_argument('OUTPUT_DIR', help="the path to the output directory")
     parser.add_argument('--single-output', default=False, action='store_true', help="generate one large HTML file containing all the tables, instead of a separate HTML file per XBRL table resource")
+    parser.add_argument('--csv', default=False, action='store_true', help="additionally generate a flat CSV file per layout table containing one row with the header label paths and the raw value for each fact")
     parser.add_argument('--max-rows', type=int, help="specifies the maximum number of rows for a single HTML table. Tables that exceed the maximum number of rows are generated as multiple HTML tables with the same header")
+    parser.add_argument('--max-bytes', type=int, help="specifies the approximate maximum size in bytes of a single HTML file. Tables that exceed the size are split into multiple HTML files with the same header")
+    parser.add_argument('--sparse', default=False, action='store_true', help="omit table rows without any facts and merge runs of empty cells into a single HTML table cell. This only reduces the output size, the facts of all cells are still queried (use --elimination to remove empty rows/columns in the layout model)")
     parser.add_argument('--lang', help='specifies the label language')
     parser.add_argument('--label-role', default="http://www.xbrl.org/2008/role/label", help='specifies the label role')
     parser.add_argument('--additional-label-role', help="specifies a role for additional labels")
     parser.add_argument('--elimination', default=False, action='store_true', help="perform empty table row/column elimination (avoids generation of empty HTML table rows/columns)")
     parser.add_argument('--elimination-aspect-nodes', default=False, action='store_true', help="perform empty table row/column elimination (avoids generation of empty HTML table rows/columns) for rows/columns that only contain aspect nodes")
+    parser.add_argument('--cache-dir', help="cache the xBRL-XML documents converted from xBRL-CSV or xBRL-JSON inputs in the given directory and reuse them as long as the input files are unchanged")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help="the number of filings, or reports within a multi-report package, processed in parallel")
+    parser.add_argument('--slice-workers', type=int, default=1, help="the number of z-slices of a table rendered in parallel")
+    parser.add_argument('--table-workers', type=int, default=1, help="the number of definition tables generated in parallel; tables are processed largest-first according to their estimated size")
+    parser.add_argument('--max-cells', type=int, help="skip tables whose estimated number of cells (derived from the breakdown trees before generating the layout model) exceeds the given limit")
+    parser.add_argument('--cell-index', default=False, action='store_true', help="add ids to all table cells with facts and write a cell_index.json file mapping each fact to the cells it appears in")
+    parser.add_argument('--update-facts', nargs='+', metavar='FACT_KEY', help="instead of generating all tables, only re-render the cells of the given facts (concept|context|unit keys from cell_index.json) in the previously generated output")
+    parser.add_argument('--table', action='append', metavar='PATTERN', help="only generate tables whose id matches the given pattern (e.g. eba_tC_*); can be specified multiple times")
+    parser.add_argument('--incremental', default=False, action='store_true', help="only regenerate tables whose fact values changed since the previous run into the same output directory")
     cmdlArgs = parser.parse_args()
-    instance = load_instance(cmdlArgs)
-    if instance:
-        generate_tables(cmdlArgs, instance)
+    if cmdlArgs.incremental and cmdlArgs.single_output:
+        parser.error('--incremental cannot be combined with --single-output')
+    files = collect_input_files(cmdlArgs.FILE)
+    if len(files) == 1:
+        cmdlArgs.FILE = files[0]
+        process_filing(cmdlArgs)
+    else:
+        process_filings(cmdlArgs, files)
 
 
 
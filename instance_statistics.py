@@ -15,40 +15,112 @@ __copyright__ = "Copyright 2015, 2016 Altova GmbH"
 __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 
 # This script uses RaptorXML Python API v2 to print out some statistics about the instance and its supporting DTS.
+# Optionally, the distribution of the facts over concepts, contexts, units, periods and dimensional qualification depth and the footnote coverage are written to a JSON file.
+#
+# This script supports the following script parameters:
+#
+#   Parameter                 Type
+#   ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+#   json                      string          Specify the name of a JSON file in the output directory to which the fact distribution statistics are written.
+#   top                       integer         Specify the number of contexts with the most facts listed in the JSON file (default: 10).
+#   approximate               boolean         Specify true to compute the JSON statistics and the footnote coverage with bounded-memory sketches instead of exact per-concept, per-context and per-fact counts.
+#
+# Example invocation:
+#   raptorxmlxbrl valxbrl --script=instance_statistics.py --script-param="json:statistics.json" nanonull.xbrl
+#
+# The script can also be run standalone on a whole corpus of instances, given as directories (searched recursively for *.xbrl files),
+# manifest files (*.txt with one instance path or URL per line) or instance files. One CSV row per filing is written as soon as the
+# filing is processed, followed by corpus totals and percentiles.
 #
 # Example invocation:
-#   raptorxmlxbrl valxbrl --script=instance_statistics.py nanonull.xbrl
+#   raptorxmlxbrl script instance_statistics.py /path/to/corpus --csv corpus.csv --summary corpus.json
+
+import argparse
+import array
+import builtins
+import collections
+import concurrent.futures
+import csv
+import json
+import math
+import multiprocessing
+import os
+import time
 
 from altova import *
 
 
+def count_items(iterable):
+    # Many taxonomy.DTS properties return generator objects which cannot be
+    # used with len() directly
+    return sum(1 for _ in iterable)
+
+
+def collect_dts_statistics(dts):
+    stats = dict.fromkeys(('concepts', 'items', 'tuples', 'hypercubes', 'dimensions'), 0)
+    timings = {}
+
+    # Linkbases embedded in taxonomy schemas are also reported by
+    # dts.linkbases, so the documents cannot be classified by their document
+    # element alone
+    start = time.perf_counter()
+    stats['documents'] = count_items(dts.documents)
+    stats['taxonomy_schemas'] = count_items(dts.taxonomy_schemas)
+    stats['linkbases'] = count_items(dts.linkbases)
+    timings['documents'] = time.perf_counter() - start
+
+    # Classify each concept in a single pass. Please note that hypercube and
+    # dimension concepts are also members of the xbrli:item substitution
+    # group, so they must be checked before items.
+    start = time.perf_counter()
+    for concept in dts.concepts:
+        stats['concepts'] += 1
+        if isinstance(concept, xbrl.taxonomy.Hypercube):
+            stats['hypercubes'] += 1
+        elif isinstance(concept, xbrl.taxonomy.Dimension):
+            stats['dimensions'] += 1
+        elif isinstance(concept, xbrl.taxonomy.Tuple):
+            stats['tuples'] += 1
+        elif isinstance(concept, xbrl.taxonomy.Item):
+            stats['items'] += 1
+    timings['concepts'] = time.perf_counter() - start
+
+    # Formula and table resources are not concepts and are counted separately
+    start = time.perf_counter()
+    stats['parameters'] = count_items(dts.parameters)
+    stats['formulas'] = count_items(dts.formulas)
+    stats['assertions'] = count_items(dts.assertions)
+    stats['tables'] = count_items(dts.tables)
+    timings['resources'] = time.perf_counter() - start
+
+    stats['timings'] = timings
+    return stats
+
+
 def print_dts_statistics(dts):
+    stats = collect_dts_statistics(dts)
 
-    # Please note that many taxonomy.DTS properties return generator objects
-    # which cannot be used with len() directly
+    print('DTS contains %d documents' % stats['documents'])
+    print('DTS contains %d taxonomy documents' % stats['taxonomy_schemas'])
+    print('DTS contains %d linkbase documents' % stats['linkbases'])
 
-    print('DTS contains %d documents' % sum(1 for _ in dts.documents))
-    print('DTS contains %d taxonomy documents' %
-          sum(1 for _ in dts.taxonomy_schemas))
-    print('DTS contains %d linkbase documents' % sum(1 for _ in dts.linkbases))
+    print('DTS contains %d concepts' % stats['concepts'])
+    print('DTS contains %d item concepts' % stats['items'])
+    print('DTS contains %d tuple concepts' % stats['tuples'])
+    print('DTS contains %d hypercubes' % stats['hypercubes'])
+    print('DTS contains %d dimensions' % stats['dimensions'])
 
-    print('DTS contains %d concepts' % sum(1 for _ in dts.concepts))
-    # Please note that hypercube and dimension concepts are also members of
-    # the xbrli:item substitution group
-    print('DTS contains %d item concepts' % (sum(1 for _ in dts.items) -
-                                             sum(1 for _ in dts.hypercubes) - sum(1 for _ in dts.dimensions)))
-    print('DTS contains %d tuple concepts' % sum(1 for _ in dts.tuples))
-    print('DTS contains %d hypercubes' % sum(1 for _ in dts.hypercubes))
-    print('DTS contains %d dimensions' % sum(1 for _ in dts.dimensions))
+    print('DTS contains %d formula parameters' % stats['parameters'])
+    print('DTS contains %d formulas' % stats['formulas'])
+    print('DTS contains %d assertions' % stats['assertions'])
+    print('DTS contains %d tables' % stats['tables'])
 
-    print('DTS contains %d formula parameters' %
-          sum(1 for _ in dts.parameters))
-    print('DTS contains %d formulas' % sum(1 for _ in dts.formulas))
-    print('DTS contains %d assertions' % sum(1 for _ in dts.assertions))
-    print('DTS contains %d tables' % sum(1 for _ in dts.tables))
+    timings = stats['timings']
+    print('Collected DTS statistics in %.3fs (documents %.3fs, concepts %.3fs, resources %.3fs)' %
+          (sum(timings.values()), timings['documents'], timings['concepts'], timings['resources']))
 
 
-def print_instance_statistics(instance):
+def print_instance_statistics(instance, footnotes=None):
 
     # Please note that many xbrl.Instance properties return generator objects
     # which cannot be used with len() directly
@@ -64,33 +136,350 @@ def print_instance_statistics(instance):
     print('Instance contains %d top-level tuple facts' %
           len(instance.child_tuples))
 
-    facts_with_footnotes = 0
-    for role in instance.footnote_link_roles():
-        network = instance.footnote_base_set(role).network_of_relationships()
-        facts_with_footnotes += sum(1 for _ in network.roots)
-    print('Instance contains %d facts with attached footnotes' %
-          facts_with_footnotes)
+    # Print statistics about footnotes
+    if footnotes is None:
+        footnotes = collect_footnote_statistics(instance)
+    print('Instance contains %d facts with attached footnotes (%.1f%% of all facts)' %
+          (footnotes['footnoted_facts'], 100 * footnotes['coverage']))
+    print('Instance contains %d footnote relationships' % footnotes['relationships'])
+    print('Instance contains %d footnote resources' % footnotes['resources'])
+    for lang, count in footnotes['resources_per_language'].items():
+        print('Instance contains %d footnote resources in language %s' %
+              (count, lang))
+
 
-    # Print statistics about embedded footnotes
-    footnotes = {}
-    for footnote_link in instance.footnote_links:
+fact_footnote_arcrole = 'http://www.xbrl.org/2003/arcrole/fact-footnote'
+
+
+def attribute_value(elem, name, default=None):
+    attr = elem.find_attribute(name)
+    return attr.normalized_value if attr else default
+
+
+def collect_footnote_statistics(instance, approximate=False):
+    # Scan all footnote links once instead of building a network of
+    # relationships per footnote link role. Only fact-footnote arcs are
+    # considered, and relationships are keyed by link role, fact id and
+    # footnote, so that prohibiting arcs can override equivalent arcs of the
+    # same or lower priority. A fact with footnotes in several roles is only
+    # counted once.
+    # In approximate mode no relationship map is kept: the footnoted facts
+    # are estimated with a HyperLogLog sketch and the relationships are
+    # counted per non-prohibited arc, so prohibiting arcs in other links and
+    # equivalent arcs are not resolved.
+    relationships = {}
+    footnoted = HyperLogLog() if approximate else None
+    arc_relationships = 0
+    resources_per_language = collections.Counter()
+    for link_index, footnote_link in enumerate(instance.footnote_links):
+        role = footnote_link.xlink_role
+        # Map the xlink:labels of the locators to the ids of the located facts
+        # or footnotes, and the labels of the footnote resources to their ids
+        located = collections.defaultdict(set)
+        footnote_ids = collections.defaultdict(set)
+        for loc in footnote_link.locators:
+            located[loc.xlink_label].add(loc.xlink_href.rpartition('#')[2])
+            footnote_ids[loc.xlink_label].add(loc.xlink_href.rpartition('#')[2])
         for footnote in footnote_link.resources:
-            if footnote.xml_lang in footnotes:
-                footnotes[footnote.xml_lang] += 1
-            else:
-                footnotes[footnote.xml_lang] = 1
-    print('Instance contains %d footnote resources' % sum(footnotes.values()))
-    for lang in footnotes.keys():
-        print('Instance contains %d footnote resources in language %s' %
-              (footnotes[lang], lang))
+            resources_per_language[footnote.xml_lang] += 1
+            # Footnotes without an id cannot be referenced from other links
+            footnote_ids[footnote.xlink_label].add(attribute_value(footnote.element, 'id') or (link_index, footnote.xlink_label))
+        for arc in footnote_link.arcs:
+            if arc.xlink_arcrole != fact_footnote_arcrole:
+                continue
+            prohibited = attribute_value(arc.element, 'use') == 'prohibited'
+            priority = int(attribute_value(arc.element, 'priority', '0'))
+            for fact_id in located.get(arc.xlink_from, ()):
+                if footnoted is not None:
+                    if not prohibited:
+                        footnoted.add(fact_id)
+                        arc_relationships += len(footnote_ids.get(arc.xlink_to, ()))
+                    continue
+                for footnote_id in footnote_ids.get(arc.xlink_to, ()):
+                    key = (role, fact_id, footnote_id)
+                    previous = relationships.get(key)
+                    # The arc with the highest priority wins, prohibition wins between arcs of equal priority
+                    if previous is None or priority > previous[0] or (priority == previous[0] and prohibited):
+                        relationships[key] = (priority, prohibited)
+
+    facts = len(instance.facts)
+    if footnoted is not None:
+        estimate = footnoted.estimate()
+        return {
+            'approximate': True,
+            'footnoted_facts': estimate,
+            'relative_error': footnoted.relative_error(),
+            'coverage': min(estimate / facts, 1.0) if facts else 0.0,
+            'relationships': arc_relationships,
+            'resources': sum(resources_per_language.values()),
+            'resources_per_language': dict(resources_per_language)
+        }
+
+    effective = [key for key, (priority, prohibited) in relationships.items() if not prohibited]
+    footnoted_facts = {fact_id for role, fact_id, footnote_id in effective}
+    return {
+        'footnoted_facts': len(footnoted_facts),
+        'coverage': len(footnoted_facts) / facts if facts else 0.0,
+        'relationships': len(effective),
+        'resources': sum(resources_per_language.values()),
+        'resources_per_language': dict(resources_per_language)
+    }
+
+
+def period_key(period):
+    # Return a string representation of a period aspect value
+    if period.period_type == xbrl.PeriodType.INSTANT:
+        return period.instant.isoformat()
+    elif period.period_type == xbrl.PeriodType.START_END:
+        return '%s/%s' % (period.start.isoformat(), period.end.isoformat())
+    return 'forever'
+
+
+def collect_fact_statistics(instance, top=10):
+    facts = 0
+    nil_facts = 0
+    tuple_facts = 0
+    per_concept = collections.Counter()
+    per_context = collections.Counter()
+    per_unit = collections.Counter()
+    per_period = collections.Counter()
+    depth = collections.Counter()
+
+    # Period and dimensional depth only depend on the context, so they are
+    # determined once per context
+    contexts = {}
+
+    # Stream over all facts exactly once
+    start = time.perf_counter()
+    for fact in instance.facts:
+        facts += 1
+        per_concept[str(fact.concept.qname)] += 1
+        if isinstance(fact, xbrl.Tuple):
+            tuple_facts += 1
+            continue
+        if fact.xsi_nil:
+            nil_facts += 1
+
+        context = fact.context
+        per_context[context.id] += 1
+        if context.id not in contexts:
+            contexts[context.id] = (period_key(context.period_aspect_value),
+                                    sum(1 for _ in context.dimension_aspect_values))
+        period, dimensions = contexts[context.id]
+        per_period[period] += 1
+        depth[dimensions] += 1
+
+        if fact.unit:
+            per_unit[fact.unit.id] += 1
+
+    return {
+        'facts': facts,
+        'nil_facts': nil_facts,
+        'nil_share': nil_facts / facts if facts else 0.0,
+        'tuple_facts': tuple_facts,
+        'facts_per_concept': dict(per_concept),
+        'facts_per_context': dict(per_context),
+        'facts_per_unit': dict(per_unit),
+        'facts_per_period': dict(per_period),
+        'dimensional_depth': {str(d): depth[d] for d in sorted(depth)},
+        'top_contexts': [{'context': id, 'facts': count, 'dimensions': contexts[id][1]}
+                         for id, count in per_context.most_common(top)],
+        'time': time.perf_counter() - start
+    }
+
+
+# Approximate statistics
+#
+# For very large instances, the exact statistics above keep one counter per
+# concept, context, unit and period. The approximate mode instead uses
+# sketches with a fixed memory footprint: HyperLogLog for distinct counts and
+# a count-min sketch for the concepts and contexts with the most facts.
+
+class HyperLogLog:
+    """Estimates the number of distinct values with 2^precision one-byte registers."""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        h = hash(value) & 0xFFFFFFFFFFFFFFFF
+        index = h >> (64 - self.precision)
+        w = h & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        e = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if e <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            e = m * math.log(m / zeros)
+        return int(round(e))
+
+    def relative_error(self):
+        # Standard error of the estimate
+        return 1.04 / math.sqrt(self.m)
+
+    def result(self):
+        return {'estimate': self.estimate(), 'relative_error': self.relative_error()}
+
+
+class CountMinSketch:
+    """Estimates counts that exceed the true count by at most epsilon * total with probability 1 - delta."""
+
+    def __init__(self, epsilon=0.001, delta=0.01):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = int(math.ceil(math.e / epsilon))
+        self.depth = int(math.ceil(math.log(1 / delta)))
+        self.rows = [array.array('q', bytes(8 * self.width)) for _ in range(self.depth)]
+        self.total = 0
+
+    def add(self, key, count=1):
+        # Derive the row hashes from a single 64-bit hash (Kirsch-Mitzenmacher)
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        self.total += count
+        estimate = None
+        for i, row in enumerate(self.rows):
+            j = (h1 + i * h2) % self.width
+            row[j] += count
+            estimate = row[j] if estimate is None else min(estimate, row[j])
+        return estimate
+
+    def max_overestimate(self):
+        return self.epsilon * self.total
+
+
+class HeavyHitters:
+    """Tracks the keys with the highest estimated counts, keeping a bounded number of candidates."""
+
+    def __init__(self, top=10, epsilon=0.001, delta=0.01):
+        self.sketch = CountMinSketch(epsilon, delta)
+        self.top = top
+        self.capacity = max(4 * top, 16)
+        self.candidates = {}
+
+    def add(self, key):
+        estimate = self.sketch.add(key)
+        candidates = self.candidates
+        if key in candidates or len(candidates) < self.capacity:
+            candidates[key] = estimate
+        else:
+            smallest = min(candidates, key=candidates.get)
+            if estimate > candidates[smallest]:
+                del candidates[smallest]
+                candidates[key] = estimate
+
+    def result(self, name):
+        bound = self.sketch.max_overestimate()
+        ranked = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)[:self.top]
+        return [{name: key, 'facts': count, 'max_overestimate': bound} for key, count in ranked]
+
+
+def collect_approximate_fact_statistics(instance, top=10, context_cache_size=1024):
+    facts = 0
+    nil_facts = 0
+    tuple_facts = 0
+    depth = collections.Counter()
+    distinct = {name: HyperLogLog() for name in ('concepts', 'contexts', 'units', 'periods',
+                                                 'entity_identifiers', 'dimension_members')}
+    top_concepts = HeavyHitters(top)
+    top_contexts = HeavyHitters(top)
+
+    # Recently seen contexts are cached in a bounded LRU, so the context
+    # aspects are usually only added to the sketches once per context
+    contexts = collections.OrderedDict()
+
+    start = time.perf_counter()
+    for fact in instance.facts:
+        facts += 1
+        concept = str(fact.concept.qname)
+        distinct['concepts'].add(concept)
+        top_concepts.add(concept)
+        if isinstance(fact, xbrl.Tuple):
+            tuple_facts += 1
+            continue
+        if fact.xsi_nil:
+            nil_facts += 1
+
+        context = fact.context
+        info = contexts.get(context.id)
+        if info is None:
+            distinct['contexts'].add(context.id)
+            period = period_key(context.period_aspect_value)
+            distinct['periods'].add(period)
+            entity = context.entity_identifier_aspect_value
+            distinct['entity_identifiers'].add((entity.scheme, entity.identifier))
+            dimensions = 0
+            for aspect in context.dimension_aspect_values:
+                dimensions += 1
+                if isinstance(aspect, xbrl.ExplicitDimensionAspectValue) and aspect.value:
+                    distinct['dimension_members'].add(str(aspect.value.qname))
+            info = contexts[context.id] = dimensions
+            if len(contexts) > context_cache_size:
+                contexts.popitem(last=False)
+        else:
+            contexts.move_to_end(context.id)
+        depth[info] += 1
+        top_contexts.add(context.id)
+
+        if fact.unit:
+            distinct['units'].add(fact.unit.id)
+
+    return {
+        'approximate': True,
+        'facts': facts,
+        'nil_facts': nil_facts,
+        'nil_share': nil_facts / facts if facts else 0.0,
+        'tuple_facts': tuple_facts,
+        'distinct': {name: sketch.result() for name, sketch in distinct.items()},
+        'dimensional_depth': {str(d): depth[d] for d in sorted(depth)},
+        'top_concepts': top_concepts.result('concept'),
+        'top_contexts': top_contexts.result('context'),
+        'confidence': 1 - top_contexts.sketch.delta,
+        'time': time.perf_counter() - start
+    }
+
+
+def fact_statistics_counts(stats):
+    # Number of distinct concepts, contexts, units and periods from an exact or approximate report
+    if stats.get('approximate'):
+        return {name: stats['distinct'][name]['estimate'] for name in ('concepts', 'contexts', 'units', 'periods')}
+    return {
+        'concepts': len(stats['facts_per_concept']),
+        'contexts': len(stats['facts_per_context']),
+        'units': len(stats['facts_per_unit']),
+        'periods': len(stats['facts_per_period'])
+    }
+
+
+def write_fact_statistics(job, instance, footnotes=None):
+    filepath = os.path.join(job.output_dir, job.script_params['json'])
+    top = int(job.script_params.get('top', '10'))
+    if job.script_params.get('approximate', 'false') == 'true':
+        stats = collect_approximate_fact_statistics(instance, top)
+    else:
+        stats = collect_fact_statistics(instance, top)
+    stats['footnotes'] = footnotes if footnotes is not None else collect_footnote_statistics(instance)
+    with builtins.open(filepath, mode='w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2)
+
+    # Register new output file with RaptorXML engine
+    job.append_output_filename(filepath)
 
 # Main entry point, will be called by RaptorXML after the XBRL taxonomy
 # (DTS) validation job has finished
 
 
 def on_dts_finished(job, dts):
-    # instance object will be None if validation was not successful
-    if instance:
+    # dts object will be None if validation was not successful
+    if dts:
         print_dts_statistics(dts)
 
 # Main entry point, will be called by RaptorXML after the XBRL instance
@@ -101,4 +490,134 @@ def on_xbrl_finished(job, instance):
     # instance object will be None if validation was not successful
     if instance:
         print_dts_statistics(instance.dts)
-        print_instance_statistics(instance)
+        # The footnote statistics are both printed and written to the JSON report
+        approximate = job.script_params.get('approximate', 'false') == 'true'
+        footnotes = collect_footnote_statistics(instance, approximate)
+        print_instance_statistics(instance, footnotes)
+        if 'json' in job.script_params:
+            write_fact_statistics(job, instance, footnotes)
+
+
+# Standalone corpus mode
+
+corpus_columns = ['file', 'facts', 'nil_facts', 'tuple_facts', 'concepts', 'contexts', 'units', 'periods',
+                  'max_depth', 'dts_documents', 'dts_concepts', 'load_time', 'stats_time', 'error']
+corpus_numeric_columns = corpus_columns[1:-1]
+
+
+def collect_corpus_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith('.xbrl'))
+        elif path.lower().endswith('.txt'):
+            # Relative paths in a manifest are resolved against the manifest location
+            base = os.path.dirname(os.path.abspath(path))
+            with builtins.open(path, mode='r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        files.append(line if '://' in line else os.path.join(base, line))
+        else:
+            files.append(path)
+    return files
+
+
+def new_corpus_row(file, error=''):
+    row = dict.fromkeys(corpus_columns, '')
+    row['file'] = file
+    row['error'] = error
+    return row
+
+
+def filing_statistics(file, approximate=False):
+    row = new_corpus_row(file)
+    start = time.perf_counter()
+    instance, log = xbrl.Instance.create_from_url(file)
+    row['load_time'] = time.perf_counter() - start
+    if not instance or log.has_errors():
+        row['error'] = ' '.join(str(log).split())
+        return row
+
+    start = time.perf_counter()
+    facts = collect_approximate_fact_statistics(instance, 0) if approximate else collect_fact_statistics(instance, 0)
+    dts = collect_dts_statistics(instance.dts)
+    row['stats_time'] = time.perf_counter() - start
+
+    row['facts'] = facts['facts']
+    row['nil_facts'] = facts['nil_facts']
+    row['tuple_facts'] = facts['tuple_facts']
+    row.update(fact_statistics_counts(facts))
+    row['max_depth'] = max((int(depth) for depth in facts['dimensional_depth']), default=0)
+    row['dts_documents'] = dts['documents']
+    row['dts_concepts'] = dts['concepts']
+    return row
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize_corpus(rows):
+    processed = [row for row in rows if not row['error']]
+    summary = {
+        'filings': len(rows),
+        'failed': len(rows) - len(processed),
+        'totals': {},
+        'percentiles': {}
+    }
+    for column in corpus_numeric_columns:
+        values = sorted(row[column] for row in processed)
+        summary['totals'][column] = sum(values)
+        summary['percentiles'][column] = {'p50': percentile(values, 50), 'p90': percentile(values, 90),
+                                          'p99': percentile(values, 99), 'max': percentile(values, 100)}
+    return summary
+
+
+def process_corpus(args):
+    files = collect_corpus_files(args.INPUT)
+    print('Processing %d filings with %d workers...' % (len(files), args.workers))
+    start = time.perf_counter()
+
+    rows = []
+    with builtins.open(args.csv, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=corpus_columns)
+        writer.writeheader()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(filing_statistics, file, args.approximate): file for file in files}
+            # Stream each row to the CSV file as soon as the filing is finished
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    row = future.result()
+                except Exception as e:
+                    row = new_corpus_row(futures[future], str(e))
+                if row['error']:
+                    print('ERROR: Processing "%s" failed: %s' % (row['file'], row['error']))
+                writer.writerow(row)
+                f.flush()
+                # Only the figures are kept for the corpus summary, the instance itself is released by the worker
+                rows.append(row)
+
+    summary = summarize_corpus(rows)
+    summary['time'] = time.perf_counter() - start
+    if args.summary:
+        with builtins.open(args.summary, mode='w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    else:
+        print(json.dumps(summary, indent=2))
+    print('Processed %d filings (%d failed) in %.3fs' % (summary['filings'], summary['failed'], summary['time']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Collect statistics over a corpus of XBRL instances using Altova RaptorXML+XBRL')
+    parser.add_argument('INPUT', nargs='+', help="directories containing *.xbrl instances, manifest files (*.txt) listing one instance per line, or instance files")
+    parser.add_argument('--csv', required=True, help="the CSV file to which one row per filing is written")
+    parser.add_argument('--summary', help="the JSON file to which the corpus totals and percentiles are written (default: print to the console)")
+    parser.add_argument('--approximate', default=False, action='store_true', help="estimate the number of distinct concepts, contexts, units and periods with bounded-memory sketches")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help="the number of filings loaded in parallel")
+    process_corpus(parser.parse_args())
@@ -19,8 +19,32 @@ __license__ = 'http://www.apache.org/licenses/LICENSE-2.0'
 # Example invocation:
 # raptorxmlxbrl valxbrl --script=presentation_linkbase_traversal.py
 # nanonull.xbrl
+#
+# Specify the output script parameter to write the trees to a file in the output directory instead of the console, e.g.
+# raptorxmlxbrl valxbrl --script=presentation_linkbase_traversal.py
+# --script-param="output:presentation.txt" nanonull.xbrl
+#
+# Specify the export script parameter to additionally store the resolved trees with concept QNames, preferred labels, order and label texts
+# in a compact JSON file. Entries in the file are keyed by the DTS entry point, which is given by the entry-point script parameter or, when
+# validating an instance, defaults to the absolute URLs of its schemaRefs (separated by spaces). Entries are only used as long as the hash over
+# the DTS documents is unchanged. The hash covers the URIs of all DTS documents but only the content of local files, remote taxonomy
+# documents are treated as immutable, e.g.
+# raptorxmlxbrl valxbrl --script=presentation_linkbase_traversal.py
+# --script-param="export:/path/to/presentation_cache.json" nanonull.xbrl
+#
+# Later queries can be served from that file without loading the DTS, e.g.
+# raptorxmlxbrl script presentation_linkbase_traversal.py /path/to/presentation_cache.json http://example.com/entry-point.xsd
+# --role http://example.com/role/BalanceSheet
 
 from altova import *
+import argparse
+import builtins
+import hashlib
+import json
+import os
+import sys
+import urllib.parse
+import urllib.request
 
 
 def concept_label(concept, label_role=None):
@@ -35,15 +59,32 @@ def concept_label(concept, label_role=None):
     return labels[0].text
 
 
-def print_tree_level(network, concept, preferred_label_role=None, level=1):
-    # Print label of concept
-    print('\t' * level, concept_label(concept, preferred_label_role))
+def print_tree(network, root, lines):
+    # Traverse the tree with an explicit stack instead of recursion, so deep
+    # networks cannot exceed Python's recursion limit. Each stack entry holds
+    # the concept, the preferred label role of the relationship leading to it
+    # and its level.
+    stack = [(root, None, 1)]
+    # Concepts on the path from the root to the current concept
+    path = []
+    while stack:
+        concept, preferred_label_role, level = stack.pop()
+        del path[level - 1:]
 
-    # Iterate over all child concepts
-    for rel in network.relationships_from(concept):
-        # Recurse for each child concept considering the preferredLabel
-        # attribute on the presentationArcs
-        print_tree_level(network, rel.target, rel.preferred_label, level + 1)
+        # Print label of concept
+        lines.append('%s %s\n' % ('\t' * level, concept_label(concept, preferred_label_role)))
+
+        # Do not descend again into a concept which is already on the path
+        if concept.qname in path:
+            lines.append('%s (cycle)\n' % ('\t' * (level + 1)))
+            continue
+        path.append(concept.qname)
+
+        # Push all child concepts in reverse order, so they are printed in
+        # relationship order, considering the preferredLabel attribute on the
+        # presentationArcs
+        children = [(rel.target, rel.preferred_label, level + 1) for rel in network.relationships_from(concept)]
+        stack.extend(reversed(children))
 
 
 def linkrole_definition(dts, linkrole):
@@ -56,8 +97,10 @@ def linkrole_definition(dts, linkrole):
         return linkrole
 
 
-def print_presentation_tree(dts, linkrole):
-    print(linkrole_definition(dts, linkrole))
+def print_presentation_tree(dts, linkrole, out=None):
+    # Collect the lines of the whole tree and write them at once instead of
+    # one console write per node
+    lines = [linkrole_definition(dts, linkrole), '\n']
 
     # Get the effective network of presentation relationships for the given
     # linkrole URI
@@ -65,13 +108,165 @@ def print_presentation_tree(dts, linkrole):
 
     # Iterate over all root concepts
     for root in network.roots:
-        print_tree_level(network, root)
+        print_tree(network, root, lines)
+
+    (out if out else sys.stdout).write(''.join(lines))
 
 
-def print_presentation_linkbase(dts):
+def print_presentation_linkbase(dts, out=None):
     # Iterate over all presentation extended link roles
     for linkrole in dts.presentation_link_roles():
-        print_presentation_tree(dts, linkrole)
+        print_presentation_tree(dts, linkrole, out)
+
+
+def write_presentation_linkbase(job, dts):
+    # Write the trees to the file given by the output script parameter or
+    # print them to the console
+    if 'output' in job.script_params:
+        filepath = os.path.join(job.output_dir, job.script_params['output'])
+        with builtins.open(filepath, mode='w', encoding='utf-8', buffering=1 << 16) as f:
+            print_presentation_linkbase(dts, f)
+        # Register new output file with RaptorXML engine
+        job.append_output_filename(filepath)
+    else:
+        print_presentation_linkbase(dts)
+
+# Presentation tree cache
+#
+# Each tree node is stored as a compact list [qname, preferred label role,
+# order, children]. The children of a node which closes a cycle are null.
+
+def documents_hash(uris):
+    # Hash the URIs of all DTS documents and the content of the local ones.
+    # Remote documents are not fetched, they are treated as immutable as long
+    # as their URI does not change
+    h = hashlib.sha256()
+    for uri in sorted(uris):
+        h.update(uri.encode('utf-8'))
+        parts = urllib.parse.urlparse(uri)
+        if parts.scheme == 'file':
+            with builtins.open(urllib.request.url2pathname(parts.path), mode='rb') as f:
+                h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def presentation_tree_nodes(network, root, concepts):
+    # Resolve the tree below root with an explicit stack, collecting each
+    # concept and the label roles used for it in concepts
+    root_node = [str(root.qname), None, None, []]
+    concepts.setdefault(root_node[0], (root, set()))[1].add('')
+    stack = [(root, root_node, 1)]
+    # Concepts on the path from the root to the current concept
+    path = []
+    while stack:
+        concept, node, level = stack.pop()
+        del path[level - 1:]
+        if node[0] in path:
+            node[3] = None
+            continue
+        path.append(node[0])
+
+        targets = []
+        for rel in network.relationships_from(concept):
+            child = [str(rel.target.qname), rel.preferred_label, rel.order, []]
+            concepts.setdefault(child[0], (rel.target, set()))[1].add(rel.preferred_label or '')
+            node[3].append(child)
+            targets.append((rel.target, child, level + 1))
+        stack.extend(reversed(targets))
+    return root_node
+
+
+def export_presentation_trees(dts, path, entry_point):
+    documents = [doc.uri for doc in dts.documents]
+    concepts = {}
+    roles = {}
+    # Iterate over all presentation extended link roles
+    for linkrole in dts.presentation_link_roles():
+        network = dts.presentation_base_set(linkrole).network_of_relationships()
+        roles[linkrole] = {
+            'definition': linkrole_definition(dts, linkrole),
+            'roots': [presentation_tree_nodes(network, root, concepts) for root in network.roots]
+        }
+
+    # Store the label texts of all label roles used in the trees, '' stands
+    # for the standard label role
+    labels = {}
+    for qname, (concept, label_roles) in concepts.items():
+        labels[qname] = {role: concept_label(concept, role if role else None) for role in label_roles}
+
+    # Keep the entries of other entry points in the same file
+    cache = load_presentation_cache(path)
+    cache[entry_point] = {
+        'documents': documents,
+        'documents_hash': documents_hash(documents),
+        'roles': roles,
+        'labels': labels
+    }
+    tmp_path = path + '.tmp'
+    with builtins.open(tmp_path, mode='w', encoding='utf-8') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def load_presentation_cache(path):
+    try:
+        with builtins.open(path, mode='r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_presentation_trees(path, entry_point, verify=True):
+    # Return the cached trees of the given entry point, or None if there are
+    # none or if any of the DTS documents changed since the export
+    entry = load_presentation_cache(path).get(entry_point)
+    if entry is None:
+        return None
+    if verify:
+        try:
+            if documents_hash(entry['documents']) != entry['documents_hash']:
+                return None
+        except OSError:
+            return None
+    return entry
+
+
+def print_cached_presentation_trees(entry, linkroles=None, out=None):
+    labels = entry['labels']
+    lines = []
+    for linkrole, role in entry['roles'].items():
+        if linkroles and linkrole not in linkroles:
+            continue
+        lines.extend((role['definition'], '\n'))
+        stack = [(root, 1) for root in reversed(role['roots'])]
+        while stack:
+            (qname, preferred_label, order, children), level = stack.pop()
+            lines.append('%s %s\n' % ('\t' * level, labels[qname].get(preferred_label or '', qname)))
+            if children is None:
+                lines.append('%s (cycle)\n' % ('\t' * (level + 1)))
+                continue
+            stack.extend((child, level + 1) for child in reversed(children))
+    (out if out else sys.stdout).write(''.join(lines))
+
+
+def instance_entry_point(instance):
+    # The absolute URLs of the schemaRefs of the instance, separated by spaces
+    refs = set()
+    for elem in instance.document_element.element_children():
+        if elem.local_name == 'schemaRef':
+            attr = elem.find_attribute(('href', 'http://www.w3.org/1999/xlink'))
+            if attr:
+                refs.add(urllib.parse.urljoin(instance.uri, attr.normalized_value.strip()))
+    return ' '.join(sorted(refs))
+
+
+def export_for_job(job, dts, entry_point=None):
+    if 'export' in job.script_params:
+        entry_point = job.script_params.get('entry-point') or entry_point
+        if not entry_point:
+            print('The entry-point script parameter is required to export the presentation trees')
+            return
+        export_presentation_trees(dts, job.script_params['export'], entry_point)
 
 # Main entry point, will be called by RaptorXML after the XBRL taxonomy
 # (DTS) validation job has finished
@@ -80,7 +275,8 @@ def print_presentation_linkbase(dts):
 def on_dts_finished(job, dts):
     # dts object will be None if validation was not successful
     if dts:
-        print_presentation_linkbase(dts)
+        write_presentation_linkbase(job, dts)
+        export_for_job(job, dts)
 
 # Main entry point, will be called by RaptorXML after the XBRL instance
 # validation job has finished
@@ -89,4 +285,18 @@ def on_dts_finished(job, dts):
 def on_xbrl_finished(job, instance):
     # instance object will be None if validation was not successful
     if instance:
-        print_presentation_linkbase(instance.dts)
+        write_presentation_linkbase(job, instance.dts)
+        export_for_job(job, instance.dts, instance_entry_point(instance))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print presentation trees from a cache file written with the export script parameter, without loading the DTS')
+    parser.add_argument('CACHE', help="the JSON cache file")
+    parser.add_argument('ENTRY_POINT', help="the DTS entry point the trees were exported for; for instances validated without the entry-point script parameter, the absolute schemaRef URLs separated by spaces")
+    parser.add_argument('--role', action='append', help="only print the trees of the given extended link role; can be specified multiple times")
+    parser.add_argument('--no-verify', dest='verify', default=True, action='store_false', help="do not check whether the DTS documents changed since the export")
+    args = parser.parse_args()
+    entry = load_presentation_trees(args.CACHE, args.ENTRY_POINT, args.verify)
+    if entry is None:
+        sys.exit('No up-to-date presentation trees for %s in %s' % (args.ENTRY_POINT, args.CACHE))
+    print_cached_presentation_trees(entry, args.role)